@@ -1,15 +1,35 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel
+from typing import Optional
+from contextlib import asynccontextmanager
 from datetime import datetime
+import hmac
 import json
+import os
 from fastapi import Body
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.simulate import simulate_tournament
+from src.traces import TRACE_DIR, TraceWriter, prune_traces
 from src.live_features import build_live_features
 from src.predict import predict_proba
+from src.ingest import ingest_match
+from src.runtime import WRITE_LOCK, active, pinned
+from src.serving import RELOAD_POLL_ENV, reload, reload_status, watch
+from src.teams import TEAMS, UnknownTeamError
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the served version before taking traffic.
+    active()
+    poll = float(os.getenv(RELOAD_POLL_ENV) or 0)
+    if poll > 0:
+        watch(poll)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,9 +64,24 @@ class PredictRequest(BaseModel):
 def predict(req: PredictRequest):
     match_date = datetime.fromisoformat(req.date)
 
-    features = build_live_features(req.team_a, req.team_b, match_date)
-
-    prob_a = predict_proba(features)
+    try:
+        team_a, team_b = TEAMS.id(req.team_a), TEAMS.id(req.team_b)
+    except UnknownTeamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with pinned() as version:
+        # Precomputed snapshot for this date if there is one, else live.
+        snap = version.snapshots.get(match_date)
+        hit = snap.pair(team_a, team_b) if snap is not None else None
+        if hit is not None:
+            features, prob_a = hit
+        else:
+            try:
+                features = build_live_features(req.team_a, req.team_b,
+                                               match_date)
+            except UnknownTeamError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            prob_a = predict_proba(features)
 
     return {
         "team_a": req.team_a,
@@ -54,6 +89,7 @@ def predict(req: PredictRequest):
         "prob_team_a_win": prob_a,
         "prob_team_b_win": 1 - prob_a,
         "features_used": features,
+        "version": version.describe(),
     }
 
 
@@ -62,15 +98,122 @@ def simulate(payload: dict = Body(...)):
     # payload can contain config directly OR a path
     config = payload.get("config")
     sims = int(payload.get("n_sims", 10000))
+    seed = payload.get("seed")
+    # Variance reduction: "plain" | "antithetic" | "stratified" | "sobol"
+    sampling = payload.get("sampling", "plain")
+    rao_blackwell = bool(payload.get("rao_blackwell", False))
+    # NRR tiebreaks: "proxy" margin or "scores" (sampled innings totals)
+    nrr = payload.get("nrr", "proxy")
+    # "trace": true also writes every simulation to artifacts/traces/ (only
+    # the newest TRACE_KEEP are kept) and returns position distributions
+    # and the likeliest knockout pairings
+    trace = None
+    if payload.get("trace"):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        trace = TraceWriter(f"{TRACE_DIR}/simulate-{stamp}.npz")
 
     if not config:
         # fallback to local file
         with open("data/t20wc2026_config.json", "r") as f:
             config = json.load(f)
 
-    results = simulate_tournament(config, n_sims=sims)
-    return {
+    trace_summary = None
+    try:
+        with pinned() as version:
+            results = simulate_tournament(config,
+                                          n_sims=sims,
+                                          seed=seed,
+                                          trace=trace,
+                                          sampling=sampling,
+                                          rao_blackwell=rao_blackwell,
+                                          nrr=nrr)
+        if trace is not None:
+            trace_summary = trace.close()
+            prune_traces()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # A failed run leaves no open zip or partial trace behind.
+        if trace is not None and not trace.closed:
+            trace.abort()
+    response = {
         "tournament": config.get("tournament", "T20WC"),
         "n_sims": sims,
-        "results": results
+        "results": results,
+        "version": version.describe(),
     }
+    if trace_summary is not None:
+        response["trace"] = trace_summary
+    return response
+
+
+class MatchResult(BaseModel):
+    date: str  # YYYY-MM-DD
+    team_1: str
+    team_2: str
+    winner: str
+    match_id: Optional[str] = None
+    venue: Optional[str] = None
+    city: Optional[str] = None
+    allow_new_teams: bool = False
+
+
+@app.post("/matches")
+def add_match(req: MatchResult):
+    # Held across the ingest so the ratings come from the version that
+    # took the result, even if a reload is about to swap it out.
+    with WRITE_LOCK:
+        try:
+            row = ingest_match(req.model_dump(exclude={"allow_new_teams"}),
+                               allow_new_teams=req.allow_new_teams)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        version = active()
+        elo = {
+            row["team_1"]: float(version.live.elo[TEAMS.id(row["team_1"])]),
+            row["team_2"]: float(version.live.elo[TEAMS.id(row["team_2"])]),
+        }
+
+    return {"match": row, "elo": elo, "version": version.describe()}
+
+
+@app.get("/version")
+def version_info():
+    with pinned() as version:
+        return {"serving": version.describe(), "reload": reload_status()}
+
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None  # default: whatever artifacts/CURRENT names
+    wait: bool = False
+
+
+# Admin endpoints need this token (X-Admin-Token header) when it is set, and
+# a request from the machine itself otherwise.
+ADMIN_TOKEN_ENV = "ADMIN_TOKEN"
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def require_admin(request: Request,
+                  x_admin_token: Optional[str] = Header(None)):
+    token = os.getenv(ADMIN_TOKEN_ENV)
+    if token:
+        if not x_admin_token or not hmac.compare_digest(x_admin_token, token):
+            raise HTTPException(status_code=403, detail="admin token required")
+    elif request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=403,
+                            detail=f"admin endpoints are localhost-only "
+                            f"unless {ADMIN_TOKEN_ENV} is set")
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+def admin_reload(req: ReloadRequest = ReloadRequest()):
+    """
+    Build the requested version in the background and swap it in; requests
+    in flight finish on the old one. With `wait`, answers once it's live.
+    """
+    try:
+        status = reload(req.version, wait=req.wait)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"serving": active().describe(), "reload": status}
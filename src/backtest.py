@@ -0,0 +1,162 @@
+"""
+Walk-forward backtest of the served prediction path.
+
+Matches are replayed in date order through a fresh LiveState. Before a
+day's results are applied, every match on that day is scored exactly as the
+API would have scored it then:
+
+  - elo      Elo expected score from the (clamped) live ratings
+  - predict  the Elo/ML blend returned by /predict (src/predict.py)
+  - simulate the history-weighted blend the simulator uses
+             (src/prob_cache.py)
+
+Features come from build_live_features_by_id on the walk-forward state, so
+each match costs O(1) state lookups instead of a history scan, and the model
+is called once for all matches at the end.
+
+The ML model is the current artifact, so seasons it was trained on are
+in-sample for the "predict"/"simulate" columns.
+
+Usage:
+    python -m src.backtest
+    python -m src.backtest --since 2019-01-01 --bins 5 --out backtest.csv
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.live_elo import history
+from src.live_features import build_live_features_by_id
+from src.live_state import LiveState
+from src.predict import predict_proba_batch
+from src.prob_cache import blend_probs, elo_expected
+
+MODELS = ["elo", "predict", "simulate"]
+
+EPS = 1e-12
+
+
+def walk_forward(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score every match before its result is known. `matches` needs date,
+    match_id, id_1, id_2 and winner_id, sorted by date. Returns one row per
+    match with the features, each model's P(team_1 wins) and the outcome.
+    """
+    state = LiveState()
+    rows = []
+
+    for date, day in matches.groupby("date", sort=True):
+        # Live features only see matches strictly before the query date, so
+        # a whole day is scored before any of it is applied.
+        for r in day.itertuples(index=False):
+            feats = build_live_features_by_id(r.id_1, r.id_2, date, state)
+            feats["played_min"] = min(state.played[r.id_1],
+                                      state.played[r.id_2])
+            rows.append(feats)
+        for r in day.itertuples(index=False):
+            state.update(r.match_id, date, r.id_1, r.id_2, r.winner_id)
+
+    out = pd.DataFrame(rows, index=matches.index)
+    out.insert(0, "date", matches["date"])
+    out.insert(1, "team_1", matches["team_1"])
+    out.insert(2, "team_2", matches["team_2"])
+    out["team_1_won"] = (matches["winner_id"] == matches["id_1"]).astype(int)
+
+    p_elo = np.array([
+        elo_expected(a, b) for a, b in zip(out["elo_a"], out["elo_b"])
+    ])
+    p_predict = predict_proba_batch(out)
+    out["p_elo"] = p_elo
+    out["p_predict"] = p_predict
+    out["p_simulate"] = blend_probs(p_predict, p_elo, out["played_min"])
+    return out
+
+
+def scores(p: np.ndarray, y: np.ndarray, bins: int) -> dict:
+    p = np.clip(p, EPS, 1 - EPS)
+    edges = np.minimum((p * bins).astype(int), bins - 1)
+    ece = 0.0
+    for b in range(bins):
+        m = edges == b
+        if m.any():
+            ece += m.mean() * abs(p[m].mean() - y[m].mean())
+    return {
+        "log_loss": float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))),
+        "brier": float(np.mean((p - y)**2)),
+        "accuracy": float(np.mean((p > 0.5) == y)),
+        "ece": float(ece),
+    }
+
+
+def season_report(scored: pd.DataFrame, bins: int = 10) -> pd.DataFrame:
+    """log loss / Brier / accuracy / expected calibration error per season."""
+    rows = []
+    groups = list(scored.groupby(scored["date"].dt.year))
+    groups.append(("all", scored))
+    for season, g in groups:
+        y = g["team_1_won"].to_numpy()
+        for m in MODELS:
+            rows.append({
+                "season": season,
+                "model": m,
+                "n": len(g),
+                **scores(g[f"p_{m}"].to_numpy(), y, bins)
+            })
+    return pd.DataFrame(rows)
+
+
+def calibration_table(scored: pd.DataFrame, bins: int = 10) -> pd.DataFrame:
+    """Mean predicted vs observed team_1 win rate per probability bin."""
+    tables = []
+    for m in MODELS:
+        p = scored[f"p_{m}"]
+        b = np.minimum((p * bins).astype(int), bins - 1)
+        t = scored.groupby(b).agg(n=("team_1_won", "size"),
+                                  predicted=(f"p_{m}", "mean"),
+                                  observed=("team_1_won", "mean"))
+        t.index = [f"{i / bins:.1f}-{(i + 1) / bins:.1f}" for i in t.index]
+        t.insert(0, "model", m)
+        tables.append(t)
+    return pd.concat(tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--since",
+                        help="only report matches on/after this date "
+                        "(state is still built from the full history)")
+    parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument("--out", help="write per-match predictions to CSV")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    scored = walk_forward(history())
+    elapsed = time.perf_counter() - t0
+
+    if args.since:
+        scored = scored[scored["date"] >= pd.Timestamp(args.since)]
+    if args.out:
+        scored.to_csv(args.out, index=False)
+
+    pd.set_option("display.width", 120)
+    report = season_report(scored, args.bins)
+    wide = report.pivot(index="season", columns="model",
+                        values=["log_loss", "brier", "ece"])
+    wide.columns = [f"{v}:{m}" for v, m in wide.columns]
+    wide.insert(0, "n", report.groupby("season", sort=False)["n"].first())
+    print(wide.round(4).to_string())
+    print()
+    print(report[report["season"] == "all"].set_index("model")
+          .drop(columns="season").round(4).to_string())
+    print()
+    print(calibration_table(scored, args.bins).round(3).to_string())
+    print(f"\n{len(scored)} matches scored, walk-forward took "
+          f"{elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
-from elo import build_elo_table
+from src.elo import build_elo_table
 
-df = build_elo_table("data/matches_t20i_men.csv")
-df.to_csv("data/elo_matches.csv", index=False)
-print(df.head())
+MATCHES_CSV = "data/matches_t20i_men.csv"
+OUTPUT_CSV = "data/elo_matches.csv"
+
+
+def main() -> None:
+    df = build_elo_table(MATCHES_CSV)
+    df.to_csv(OUTPUT_CSV, index=False)
+    print(df.head())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Build all-pairs prediction snapshots (see src/snapshot_store.py).
+
+Usage:
+    python -m src.build_snapshots                  # as_of of every data/*_config.json
+    python -m src.build_snapshots 2026-02-07 2026-03-01
+    python -m src.build_snapshots --prune          # delete stale snapshots
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from itertools import permutations
+
+import numpy as np
+import pandas as pd
+
+from src.live_elo import history
+from src.live_features import build_live_features_by_id
+from src.live_state import LiveState, live
+from src.predict import FEATURES, predict_proba_batch
+from src.prob_cache import blend_probs, elo_expected
+from src.runtime import current
+from src.snapshot_store import SNAPSHOT_DIR, Snapshot, fingerprint
+from src.teams import FULL_MEMBERS, TEAMS
+from src.tournament import DEFAULT_AS_OF
+
+# Teams with a match in this many years before the snapshot date (plus the
+# full members) are included.
+ACTIVE_YEARS = 3
+
+
+def state_as_of(as_of: datetime) -> LiveState:
+    """Live state holding exactly the matches before `as_of`."""
+    if live().covers(as_of):
+        return live()
+    state = LiveState()
+    hist = history()
+    for r in hist[hist["date"] < as_of].itertuples(index=False):
+        state.update(r.match_id, r.date, r.id_1, r.id_2, r.winner_id)
+    return state
+
+
+def active_teams(as_of: datetime) -> np.ndarray:
+    hist = history()
+    recent = hist[(hist["date"] < as_of) & (hist["date"] >= pd.Timestamp(
+        as_of) - pd.DateOffset(years=ACTIVE_YEARS))]
+    ids = set(recent["id_1"]) | set(recent["id_2"]) | set(
+        TEAMS.ids(FULL_MEMBERS))
+    return np.array(sorted(ids), dtype=np.int64)
+
+
+def build_snapshot(as_of: datetime, root: str = SNAPSHOT_DIR) -> str:
+    day = as_of.date().isoformat()
+    version = current()
+    state = state_as_of(as_of)
+    team_ids = active_teams(as_of)
+    n = len(team_ids)
+
+    pairs = list(permutations(range(n), 2))
+    feats = pd.DataFrame([
+        build_live_features_by_id(int(team_ids[i]), int(team_ids[j]), as_of,
+                                  state) for i, j in pairs
+    ])
+    i_idx = np.array([i for i, _ in pairs], dtype=np.int64)
+    j_idx = np.array([j for _, j in pairs], dtype=np.int64)
+
+    p_predict = predict_proba_batch(feats)
+    p_elo = np.array([
+        elo_expected(a, b) for a, b in zip(feats["elo_a"], feats["elo_b"])
+    ])
+    with state.lock:
+        played = state.played[team_ids]
+    p_simulate = blend_probs(p_predict, p_elo,
+                             np.minimum(played[i_idx], played[j_idx]))
+
+    features = np.zeros((n, n, len(FEATURES)))
+    features[i_idx, j_idx] = feats[FEATURES].to_numpy()
+    predict = np.full((n, n), 0.5)
+    predict[i_idx, j_idx] = p_predict
+    simulate = np.full((n, n), 0.5)
+    simulate[i_idx, j_idx] = p_simulate
+
+    # Write next to the target and swap it in, so readers never see a
+    # half-written snapshot.
+    path = os.path.join(root, day)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    np.save(os.path.join(tmp, "features.npy"), features)
+    np.save(os.path.join(tmp, "predict.npy"), predict)
+    np.save(os.path.join(tmp, "simulate.npy"), simulate)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "as_of": day,
+                "teams": [TEAMS.name(t) for t in team_ids],
+                "features": FEATURES,
+                "fingerprint": fingerprint(day, version.model_path,
+                                           version.matches_path),
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+            },
+            f,
+            indent=2)
+
+    if os.path.exists(path):
+        old = f"{path}.old-{os.getpid()}"
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, path)
+    return path
+
+
+def config_dates(pattern: str = "data/*_config.json") -> list[str]:
+    dates = set()
+    for p in glob.glob(pattern):
+        with open(p, "r") as f:
+            dates.add(str(json.load(f).get("as_of", DEFAULT_AS_OF)))
+    return sorted(dates)
+
+
+def prune(root: str = SNAPSHOT_DIR) -> list[str]:
+    version = current()
+    removed = []
+    for path in sorted(glob.glob(os.path.join(root, "*"))):
+        meta = os.path.join(path, "meta.json")
+        if not os.path.exists(meta):
+            continue
+        if Snapshot(path).meta.get("fingerprint") != fingerprint(
+                os.path.basename(path), version.model_path,
+                version.matches_path):
+            shutil.rmtree(path)
+            removed.append(path)
+    version.snapshots.clear()
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute all-pairs predictions for fixed dates.")
+    parser.add_argument("dates", nargs="*", help="YYYY-MM-DD")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete snapshots that no longer match the "
+                        "model/data")
+    args = parser.parse_args()
+
+    if args.prune:
+        for path in prune():
+            print(f"removed stale {path}")
+        return
+
+    for day in args.dates or config_dates():
+        t0 = time.perf_counter()
+        path = build_snapshot(datetime.fromisoformat(day))
+        print(f"{path}: {len(Snapshot(path).teams)} teams "
+              f"in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
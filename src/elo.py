@@ -1,7 +1,8 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from typing import DefaultDict
+
+from src.teams import TeamRegistry
 
 K: float = 20.0
 BASE_ELO: float = 1500.0
@@ -15,31 +16,34 @@ def build_elo_table(matches_csv: str) -> pd.DataFrame:
     df = pd.read_csv(matches_csv, parse_dates=["date"])
     df = df.sort_values("date").reset_index(drop=True)
 
-    elo: DefaultDict[str, float] = defaultdict(lambda: BASE_ELO)
+    teams = TeamRegistry.from_matches(matches_csv)
+    ids_1 = teams.encode(df["team_1"])
+    ids_2 = teams.encode(df["team_2"])
+    winner_ids = teams.encode(df["winner"])
 
-    rows = []
-    for _, r in df.iterrows():
-        a = str(r["team_1"])
-        b = str(r["team_2"])
-        w = str(r["winner"])
+    elo = np.full(len(teams), BASE_ELO)
+    elo_1 = np.empty(len(df))
+    elo_2 = np.empty(len(df))
 
+    for i, (a, b, w) in enumerate(zip(ids_1, ids_2, winner_ids)):
         ra = elo[a]
         rb = elo[b]
 
         ea = expected(ra, rb)
         sa = 1.0 if w == a else 0.0
 
-        rows.append({
-            "match_id": str(r["match_id"]),
-            "date": r["date"],
-            "team_1": a,
-            "team_2": b,
-            "elo_team_1": ra,
-            "elo_team_2": rb,
-            "elo_diff": ra - rb
-        })
+        elo_1[i] = ra
+        elo_2[i] = rb
 
         elo[a] = ra + K * (sa - ea)
         elo[b] = rb + K * ((1 - sa) - (1 - ea))
 
-    return pd.DataFrame(rows)
+    return pd.DataFrame({
+        "match_id": df["match_id"].astype(str),
+        "date": df["date"],
+        "team_1": [teams.name(i) for i in ids_1],
+        "team_2": [teams.name(i) for i in ids_2],
+        "elo_team_1": elo_1,
+        "elo_team_2": elo_2,
+        "elo_diff": elo_1 - elo_2,
+    })
@@ -0,0 +1,224 @@
+"""
+Tune the live Elo constants (see src/live_elo.py) by replaying the match
+history once for many parameter sets at the same time.
+
+Ratings are held in a (n_teams, n_configs) matrix; each match updates two
+rows of it, so the cost of a sweep is one pass over the history with
+vectorised updates rather than one Python replay per configuration.
+
+Usage:
+    python -m src.elo_tune                     # default ~1000-config grid
+    python -m src.elo_tune --since 2015-01-01 --top 20
+    python -m src.elo_tune --k-assoc 20 25 30 35 --start-full 1600 1650
+    python -m src.elo_tune --bench
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from itertools import product
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.live_elo import (ASSOCIATE_CAP, FULL_MEMBERS, K_ASSOC, K_FULL,
+                          MatchHistory, initial_rating)
+from src.teams import TEAMS
+
+MATCHES_CSV = "data/matches_t20i_men.csv"
+
+PARAMS = ["k_full", "k_assoc", "associate_cap", "start_full", "start_assoc"]
+
+# Wide enough that the best configuration on the bundled history lies
+# inside every range; `main` says so when a winner sits on an edge.
+DEFAULT_GRID: Dict[str, Sequence[float]] = {
+    "k_full": [5, 10, 15, 20, 30, 40],
+    "k_assoc": [20, 40, 60, 80, 100, 120],
+    "associate_cap": [1650, 1750, 1850, 1950, np.inf],
+    "start_full": [1700, 1800, 1900, 2000, 2100, 2200],
+    "start_assoc": [1450],
+}
+
+EPS = 1e-12
+
+
+def load_matches(path: str = MATCHES_CSV) -> pd.DataFrame:
+    df = pd.read_csv(path, parse_dates=["date"])
+    for col in ["team_1", "team_2", "winner"]:
+        df[col] = df[col].astype(str).str.strip()
+    df["id_1"] = TEAMS.encode(df["team_1"])
+    df["id_2"] = TEAMS.encode(df["team_2"])
+    df["winner_id"] = TEAMS.encode(df["winner"])
+    # Same ordering as live_elo so single-config results match elo_as_of.
+    return df.sort_values("date").reset_index(drop=True)
+
+
+def make_grid(grid: Dict[str, Sequence[float]] = DEFAULT_GRID) -> pd.DataFrame:
+    """Cartesian product of `grid` as one row per configuration."""
+    rows = list(product(*(grid[p] for p in PARAMS)))
+    return pd.DataFrame(rows, columns=PARAMS, dtype=float)
+
+
+def current_params() -> pd.DataFrame:
+    """The constants live_elo uses today, as a one-row grid."""
+    return pd.DataFrame([{
+        "k_full": K_FULL,
+        "k_assoc": K_ASSOC,
+        "associate_cap": ASSOCIATE_CAP,
+        "start_full": initial_rating(next(iter(FULL_MEMBERS))),
+        "start_assoc": initial_rating(""),
+    }],
+                        columns=PARAMS,
+                        dtype=float)
+
+
+def replay(matches: pd.DataFrame,
+           params: pd.DataFrame,
+           since: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replay every match once for all configurations in `params`.
+
+    Returns (ratings, log_loss):
+      - ratings:  final ratings indexed by team ID, shape (n_teams, n_configs)
+      - log_loss: mean log loss of the pre-match Elo expectation over the
+                  matches dated on/after `since`, shape (n_configs,)
+    """
+    n = len(matches)
+    a_idx = matches["id_1"].to_numpy()
+    b_idx = matches["id_2"].to_numpy()
+    a_won = (matches["winner_id"] == matches["id_1"]).to_numpy()
+
+    scored = np.ones(n, dtype=bool)
+    if since is not None:
+        scored = (matches["date"] >= pd.Timestamp(since)).to_numpy()
+
+    is_full = np.array([t in FULL_MEMBERS for t in TEAMS.names])[:, None]
+
+    k_full = params["k_full"].to_numpy()[None, :]
+    k_assoc = params["k_assoc"].to_numpy()[None, :]
+    cap = params["associate_cap"].to_numpy()[None, :]
+    start_full = params["start_full"].to_numpy()[None, :]
+    start_assoc = params["start_assoc"].to_numpy()[None, :]
+
+    # Per-team constants; a team's rating sits at its start value until its
+    # first match, so initialising everyone up front is equivalent.
+    ratings = np.where(is_full, start_full, start_assoc).astype(float)
+    k_team = np.where(is_full, k_full, k_assoc)
+    cap_team = np.where(is_full, np.inf, cap)
+
+    loss = np.zeros(len(params))
+    for i in range(n):
+        a = a_idx[i]
+        b = b_idx[i]
+        ra = ratings[a]
+        rb = ratings[b]
+
+        ea = 1.0 / (1.0 + 10.0**((rb - ra) / 400.0))
+
+        if a_won[i]:
+            if scored[i]:
+                loss -= np.log(np.maximum(ea, EPS))
+            delta = 1.0 - ea
+        else:
+            if scored[i]:
+                loss -= np.log(np.maximum(1.0 - ea, EPS))
+            delta = -ea
+
+        ratings[a] = np.minimum(ra + k_team[a] * delta, cap_team[a])
+        ratings[b] = np.minimum(rb - k_team[b] * delta, cap_team[b])
+
+    n_scored = max(int(scored.sum()), 1)
+    return ratings, loss / n_scored
+
+
+def sweep(matches: pd.DataFrame,
+          params: pd.DataFrame,
+          since: str | None = None) -> pd.DataFrame:
+    """`params` with a log_loss column, best configuration first."""
+    _, loss = replay(matches, params, since=since)
+    out = params.copy()
+    out["log_loss"] = loss
+    return out.sort_values("log_loss").reset_index(drop=True)
+
+
+def edge_params(best: pd.Series,
+                grid: Dict[str, Sequence[float]]) -> list[str]:
+    """
+    Parameters whose value in `best` is the smallest or largest one tried,
+    so the optimum may lie outside the grid. Fixed parameters and an
+    uncapped (inf) associate cap don't count.
+    """
+    edges = []
+    for name in PARAMS:
+        values = sorted(grid[name])
+        if len(values) > 1 and np.isfinite(best[name]) and best[name] in (
+                values[0], values[-1]):
+            edges.append(name)
+    return edges
+
+
+def _elo_as_of_seconds(path: str = MATCHES_CSV) -> float:
+    """
+    Time one cold `elo_as_of` call over the whole history: a fresh
+    MatchHistory, so nothing comes from the ratings cache.
+    """
+    history = MatchHistory.from_csv(path)
+    as_of = history.history()["date"].max() + pd.Timedelta(days=1)
+    t0 = time.perf_counter()
+    history.elo_as_of(as_of.to_pydatetime())
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep live Elo constants")
+    parser.add_argument("--since",
+                        default=None,
+                        help="only score matches on/after this date")
+    parser.add_argument("--top", type=int, default=10)
+    for name in PARAMS:
+        parser.add_argument(f"--{name.replace('_', '-')}",
+                            nargs="+",
+                            type=float,
+                            default=None,
+                            help=f"values to try (default {DEFAULT_GRID[name]})")
+    parser.add_argument("--bench",
+                        action="store_true",
+                        help="compare against single elo_as_of replays")
+    args = parser.parse_args()
+
+    matches = load_matches()
+    grid = make_grid({
+        name: getattr(args, name) or DEFAULT_GRID[name]
+        for name in PARAMS
+    })
+
+    t0 = time.perf_counter()
+    results = sweep(matches, grid, since=args.since)
+    sweep_s = time.perf_counter() - t0
+
+    current = sweep(matches, current_params(), since=args.since)
+
+    pd.set_option("display.width", 120)
+    print(f"Configurations: {len(grid):,}  matches: {len(matches):,}  "
+          f"sweep: {sweep_s:.2f}s")
+    print(f"\nTop {args.top} by log loss:")
+    print(results.head(args.top).to_string(index=False))
+    grid_values = {name: sorted(set(grid[name])) for name in PARAMS}
+    for name in edge_params(results.iloc[0], grid_values):
+        values = grid_values[name]
+        print(f"note: best {name}={results.iloc[0][name]:g} is at the edge "
+              f"of the grid ({values[0]:g}..{values[-1]:g}); widen "
+              f"--{name.replace('_', '-')} to look past it")
+    print("\nCurrent live_elo constants:")
+    print(current.to_string(index=False))
+
+    if args.bench:
+        single_s = min(_elo_as_of_seconds() for _ in range(3))
+        print(f"\nSingle elo_as_of replay (cold cache): {single_s:.3f}s")
+        print(f"Sweep of {len(grid):,} configs = "
+              f"{sweep_s / single_s:.1f} elo_as_of replays")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 # src/features.py
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any
 
+from src.teams import TeamRegistry
+
 ROLLING_N = 5
 H2H_YEARS = 3
 BASE_ELO_FALLBACK = 1500.0
@@ -30,37 +33,48 @@ def build_features(matches_csv: str, elo_csv: str) -> pd.DataFrame:
     # Pre-sort once
     df = df.sort_values("date").reset_index(drop=True)
 
-    for r in df.itertuples(index=False):
-        team_a = str(r.team_1)
-        team_b = str(r.team_2)
+    teams = TeamRegistry.from_matches(matches_csv)
+    df_ids_1 = teams.encode(df["team_1"])
+    df_ids_2 = teams.encode(df["team_2"])
+    df_winner_ids = teams.encode(df["winner"])
+
+    # History in file order, as integer columns, so each lookup below is a
+    # couple of vectorised comparisons instead of string filters.
+    HIST = pd.read_csv(matches_csv, parse_dates=["date"])
+    hist_dates = HIST["date"].to_numpy()
+    hist_1 = teams.encode(HIST["team_1"])
+    hist_2 = teams.encode(HIST["team_2"])
+    hist_w = teams.encode(HIST["winner"])
+
+    for i, r in enumerate(df.itertuples(index=False)):
+        a_id = df_ids_1[i]
+        b_id = df_ids_2[i]
         date = pd.Timestamp(r.date)
-        winner = str(r.winner)
-
-        HIST = pd.read_csv("data/matches_t20i_men.csv", parse_dates=["date"])
 
-        past = HIST[HIST["date"] < date]
+        past = hist_dates < date.to_datetime64()
 
-        def team_form(team: str) -> float:
-            team_matches = past[(past["team_1"] == team) |
-                                (past["team_2"] == team)].tail(ROLLING_N)
-            if team_matches.empty:
+        def team_form(team: int) -> float:
+            idx = np.flatnonzero(past & ((hist_1 == team) |
+                                         (hist_2 == team)))[-ROLLING_N:]
+            if len(idx) == 0:
                 return 0.5
-            wins = (team_matches["winner"] == team).sum()
-            return float(wins / len(team_matches))
+            wins = (hist_w[idx] == team).sum()
+            return float(wins / len(idx))
 
-        def head_to_head(a: str, b: str) -> float:
+        def head_to_head(a: int, b: int) -> float:
             cutoff = date - pd.DateOffset(years=H2H_YEARS)
-            h2h = past[(past["date"] >= cutoff)
-                       & (((past["team_1"] == a) & (past["team_2"] == b))
-                          | ((past["team_1"] == b) & (past["team_2"] == a)))]
-            if h2h.empty:
+            h2h = past & (hist_dates >= cutoff.to_datetime64()) & (
+                ((hist_1 == a) & (hist_2 == b)) | ((hist_1 == b) &
+                                                   (hist_2 == a)))
+            n = int(h2h.sum())
+            if n == 0:
                 return 0.5
-            wins = (h2h["winner"] == a).sum()
-            return float(wins / len(h2h))
+            wins = (hist_w[h2h] == a).sum()
+            return float(wins / n)
 
-        a_form = team_form(team_a)
-        b_form = team_form(team_b)
-        h2h_rate = head_to_head(team_a, team_b)
+        a_form = team_form(a_id)
+        b_form = team_form(b_id)
+        h2h_rate = head_to_head(a_id, b_id)
 
         # Elo values from itertuples are stable and Pyright-friendly
         raw_elo_a = r.elo_team_1
@@ -73,8 +87,8 @@ def build_features(matches_csv: str, elo_csv: str) -> pd.DataFrame:
 
         rows.append({
             "date": date,
-            "team_a": team_a,
-            "team_b": team_b,
+            "team_a": teams.name(a_id),
+            "team_b": teams.name(b_id),
             "team_a_form": a_form,
             "team_b_form": b_form,
             "form_diff": a_form - b_form,
@@ -82,7 +96,7 @@ def build_features(matches_csv: str, elo_csv: str) -> pd.DataFrame:
             "elo_a": elo_a,
             "elo_b": elo_b,
             "elo_diff": elo_d,
-            "team_a_won": 1 if winner == team_a else 0,
+            "team_a_won": 1 if df_winner_ids[i] == a_id else 0,
         })
 
     return pd.DataFrame(rows)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from src.live_state import append_log
+from src.prob_cache import invalidate_teams
+from src.runtime import WRITE_LOCK, active
+from src.teams import TEAMS
+
+
+def _canonical(name: str) -> str:
+    """Registered spelling of `name`, or its whitespace-normalised form."""
+    if name in TEAMS:
+        return TEAMS.canonical(name)
+    return " ".join(str(name).split())
+
+
+def ingest_match(match: dict, allow_new_teams: bool = False) -> dict:
+    """
+    Record a finished match and fold it into the live state.
+
+    The result is applied to the live Elo ratings, form windows, H2H
+    history and played counts of the active served version, then appended
+    to the ingestion log (so it survives a restart, and a reload in
+    progress replays it). Cached ratings/probabilities that should now see
+    this result are invalidated.
+
+    Team names are resolved through the team registry; a team that has
+    never played before is only registered when `allow_new_teams` is set.
+
+    Raises ValueError (UnknownTeamError for unregistered names) for
+    malformed, duplicate or out-of-order results.
+    """
+    for key in ("team_1", "team_2", "winner"):
+        if not str(match.get(key) or "").strip():
+            raise ValueError(f"{key} is required")
+
+    date = pd.Timestamp(match["date"]).normalize()
+
+    with WRITE_LOCK:
+        version = active()
+        live = version.live
+        if not live.accepts(date):
+            raise ValueError(
+                f"match dated {date.date().isoformat()} is older than the "
+                f"latest known match ({live.last_date.date().isoformat()})")
+
+        # Resolve names without registering anything: a rejected result
+        # must not leave a new team behind.
+        if not allow_new_teams:
+            TEAMS.id(match["team_1"])
+            TEAMS.id(match["team_2"])
+        team_1, team_2, winner = (_canonical(match[k])
+                                  for k in ("team_1", "team_2", "winner"))
+
+        if team_1.casefold() == team_2.casefold():
+            raise ValueError("team_1 and team_2 must be two different teams")
+        if winner.casefold() not in (team_1.casefold(), team_2.casefold()):
+            raise ValueError(f"winner must be {team_1!r} or {team_2!r}")
+        winner = team_1 if winner.casefold() == team_1.casefold() else team_2
+
+        match_id = str(
+            match.get("match_id")
+            or f"live-{date.date().isoformat()}-{team_1}-{team_2}")
+        if match_id in live.match_ids:
+            raise ValueError(f"match {match_id} has already been recorded")
+
+        row = {
+            "match_id": match_id,
+            "date": date.date().isoformat(),
+            "team_1": team_1,
+            "team_2": team_2,
+            "winner": winner,
+            "result": None,
+            "venue": match.get("venue"),
+            "city": match.get("city"),
+            "toss_winner": match.get("toss_winner"),
+            "toss_decision": match.get("toss_decision"),
+            "by_runs": match.get("by_runs"),
+            "by_wickets": match.get("by_wickets"),
+        }
+
+        # Every check passed: only now can a debutant be registered.
+        id_1, id_2 = TEAMS.add(team_1), TEAMS.add(team_2)
+        winner_id = id_1 if winner == team_1 else id_2
+
+        # Logged only once the in-memory update went through, so the log
+        # never holds a result the running state rejected.
+        version.matches.append(row)
+        live.update(match_id, date, id_1, id_2, winner_id)
+        invalidate_teams([id_1, id_2], date.to_pydatetime(),
+                         version.prob_cache)
+        append_log(row)
+
+    return row
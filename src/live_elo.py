@@ -1,78 +1,152 @@
 from __future__ import annotations
 
+import threading
+
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, List
 from datetime import datetime
 
+from src.runtime import current
+from src.teams import FULL_MEMBERS, MATCHES_CSV, TEAMS
+
 K_FULL = 20.0
 K_ASSOC = 10.0
 ASSOCIATE_CAP = 1550.0
 
-FULL_MEMBERS = {
-    "India",
-    "Australia",
-    "England",
-    "Pakistan",
-    "South Africa",
-    "New Zealand",
-    "Sri Lanka",
-    "West Indies",
-    "Afghanistan",
-    "Ireland",
-    "Zimbabwe",
-}
+# Per-team-ID flag, extended when the registry grows (ingested debutants).
+_IS_FULL: List[bool] = []
 
 
 def expected(a: float, b: float) -> float:
     return 1.0 / (1.0 + 10**((b - a) / 400.0))
 
 
-_matches = (pd.read_csv(
-    "data/matches_t20i_men.csv",
-    parse_dates=["date"]).sort_values("date").reset_index(drop=True))
+def initial_rating(team: str) -> float:
+    return 1550.0 if team in FULL_MEMBERS else 1450.0
+
+
+def is_full_member(team_id: int) -> bool:
+    while len(_IS_FULL) < len(TEAMS):
+        _IS_FULL.append(TEAMS.name(len(_IS_FULL)) in FULL_MEMBERS)
+    return _IS_FULL[team_id]
+
+
+def initial_ratings() -> np.ndarray:
+    """Starting rating for every registered team, indexed by team ID."""
+    return np.array([initial_rating(n) for n in TEAMS.names], dtype=float)
+
+
+def update_ratings(elo: np.ndarray, a: int, b: int, a_won: bool) -> None:
+    """Apply one result to the ID-indexed ratings array `elo` in place."""
+    ra = elo[a]
+    rb = elo[b]
+
+    ea = expected(ra, rb)
+    sa = 1.0 if a_won else 0.0
+
+    is_a_full = is_full_member(a)
+    is_b_full = is_full_member(b)
+
+    k_a = K_FULL if is_a_full else K_ASSOC
+    k_b = K_FULL if is_b_full else K_ASSOC
 
-for col in ["team_1", "team_2", "winner"]:
-    _matches[col] = _matches[col].astype(str).str.strip()
+    new_a = ra + k_a * (sa - ea)
+    new_b = rb + k_b * ((1.0 - sa) - (1.0 - ea))
 
-_ELO_CACHE: Dict[str, Dict[str, float]] = {}
+    elo[a] = new_a if is_a_full else min(new_a, ASSOCIATE_CAP)
+    elo[b] = new_b if is_b_full else min(new_b, ASSOCIATE_CAP)
 
 
-def elo_as_of(as_of: datetime) -> Dict[str, float]:
-    key = as_of.date().isoformat()
-    if key in _ELO_CACHE:
-        return _ELO_CACHE[key]
+def _with_ids(df: pd.DataFrame) -> pd.DataFrame:
+    for col in ["team_1", "team_2", "winner"]:
+        df[col] = df[col].astype(str).str.strip()
+    df["id_1"] = TEAMS.encode(df["team_1"])
+    df["id_2"] = TEAMS.encode(df["team_2"])
+    df["winner_id"] = TEAMS.encode(df["winner"])
+    return df
 
-    elo: Dict[str, float] = {}
 
-    def get_rating(team: str) -> float:
-        if team not in elo:
-            elo[team] = 1550.0 if team in FULL_MEMBERS else 1450.0
-        return elo[team]
+class MatchHistory:
+    """
+    The match table one served version is built from, plus the results
+    ingested into it at runtime, and ratings cached per as-of day.
+    """
 
-    past = _matches[_matches["date"] < as_of]
+    def __init__(self, matches: pd.DataFrame):
+        self._matches = _with_ids(
+            matches.sort_values("date").reset_index(drop=True))
+        # Results ingested at runtime. They are only folded into `_matches`
+        # when somebody actually needs the full history, so appending stays
+        # O(1).
+        self._pending: List[dict] = []
+        self._elo_cache: Dict[str, np.ndarray] = {}
+        self.n_ingested = 0
+        # Requests run on a threadpool: guards the pending fold and changes
+        # to the ratings cache.
+        self._lock = threading.Lock()
 
-    for r in past.itertuples(index=False):
-        a = r.team_1
-        b = r.team_2
-        w = r.winner
+    @classmethod
+    def from_csv(cls, path: str = MATCHES_CSV) -> "MatchHistory":
+        return cls(pd.read_csv(path, parse_dates=["date"]))
 
-        ra = get_rating(a)
-        rb = get_rating(b)
+    def history(self) -> pd.DataFrame:
+        """All known matches (table + ingested), sorted by date."""
+        with self._lock:
+            if self._pending:
+                new = pd.DataFrame(self._pending)
+                new["date"] = pd.to_datetime(new["date"])
+                self._matches = pd.concat([self._matches, _with_ids(new)],
+                                          ignore_index=True)
+                self._pending.clear()
+            return self._matches
 
-        ea = expected(ra, rb)
-        sa = 1.0 if w == a else 0.0
+    def append(self, row: dict) -> None:
+        """
+        Add a result dated on/after every known match and drop cached
+        ratings that should now include it.
+        """
+        day = pd.Timestamp(row["date"]).date().isoformat()
+        with self._lock:
+            self._pending.append(row)
+            self.n_ingested += 1
+            for key in [k for k in list(self._elo_cache) if k > day]:
+                del self._elo_cache[key]
 
-        is_a_full = a in FULL_MEMBERS
-        is_b_full = b in FULL_MEMBERS
+    def elo_as_of(self, as_of: datetime) -> np.ndarray:
+        """Ratings indexed by team ID, using every match dated before `as_of`."""
+        key = as_of.date().isoformat()
+        cached = self._elo_cache.get(key)
+        if cached is not None and len(cached) == len(TEAMS):
+            return cached
 
-        k_a = K_FULL if is_a_full else K_ASSOC
-        k_b = K_FULL if is_b_full else K_ASSOC
+        elo = initial_ratings()
 
-        new_a = ra + k_a * (sa - ea)
-        new_b = rb + k_b * ((1.0 - sa) - (1.0 - ea))
+        matches = self.history()
+        past = matches[matches["date"] < as_of]
 
-        elo[a] = new_a if is_a_full else min(new_a, ASSOCIATE_CAP)
-        elo[b] = new_b if is_b_full else min(new_b, ASSOCIATE_CAP)
+        for a, b, w in zip(past["id_1"].to_numpy(), past["id_2"].to_numpy(),
+                           past["winner_id"].to_numpy()):
+            update_ratings(elo, a, b, w == a)
 
-    _ELO_CACHE[key] = dict(elo)
-    return _ELO_CACHE[key]
+        with self._lock:
+            self._elo_cache[key] = elo
+        return elo
+
+
+# The functions below work on the served version's history (see
+# src/runtime.py): the request's pinned version, else the active one.
+
+
+def history() -> pd.DataFrame:
+    """All known matches (CSV + ingested), sorted by date."""
+    return current().matches.history()
+
+
+def append_match(row: dict) -> None:
+    current().matches.append(row)
+
+
+def elo_as_of(as_of: datetime) -> np.ndarray:
+    """Ratings indexed by team ID, using every match dated before `as_of`."""
+    return current().matches.elo_as_of(as_of)
@@ -1,65 +1,94 @@
-import pandas as pd
-from src.live_elo import elo_as_of
-
-MATCHES_PATH = "data/matches_t20i_men.csv"
-ROLLING_N = 10
-H2H_YEARS = 3
-
-df = pd.read_csv(MATCHES_PATH, parse_dates=["date"])
-
-for col in ["team_1", "team_2", "winner"]:
-    df[col] = df[col].astype(str).str.strip()
+from __future__ import annotations
 
+import pandas as pd
+from src.live_elo import elo_as_of, history
+from src.live_state import H2H_YEARS, ROLLING_N, LiveState, live
+from src.teams import TEAMS, UnknownTeamError
 
-def team_form(team: str, as_of_date):
-    past = df[df["date"] < as_of_date]
-    team_matches = past[(past["team_1"] == team) |
-                        (past["team_2"] == team)].tail(ROLLING_N)
 
+def team_form(team: int, as_of_date, state: LiveState | None = None):
+    state = live() if state is None else state
     # Bayesian smoothing prior
     prior_games = 10
     prior_wins = 5
 
+    if state.covers(as_of_date):
+        wins, games = state.form_record(team)
+        return (wins + prior_wins) / (games + prior_games)
+
+    df = history()
+    past = df[df["date"] < as_of_date]
+    team_matches = past[(past["id_1"] == team) |
+                        (past["id_2"] == team)].tail(ROLLING_N)
+
     if team_matches.empty:
         return prior_wins / prior_games  # 0.5
 
-    wins = (team_matches["winner"] == team).sum()
+    wins = (team_matches["winner_id"] == team).sum()
     games = len(team_matches)
 
     return (wins + prior_wins) / (games + prior_games)
 
 
-def head_to_head(team_a: str, team_b: str, as_of_date):
-    cutoff = as_of_date - pd.DateOffset(years=H2H_YEARS)
-    past = df[(df["date"] < as_of_date)
-              & (df["date"] >= cutoff)
-              & (((df["team_1"] == team_a) & (df["team_2"] == team_b))
-                 | ((df["team_1"] == team_b) & (df["team_2"] == team_a)))]
-
+def head_to_head(team_a: int, team_b: int, as_of_date,
+                 state: LiveState | None = None):
+    state = live() if state is None else state
     # Bayesian smoothing prior
     prior_games = 6
     prior_wins = 3
 
+    if state.covers(as_of_date):
+        wins, games = state.h2h_record(team_a, team_b, as_of_date)
+        return (wins + prior_wins) / (games + prior_games)
+
+    df = history()
+    cutoff = as_of_date - pd.DateOffset(years=H2H_YEARS)
+    past = df[(df["date"] < as_of_date)
+              & (df["date"] >= cutoff)
+              & (((df["id_1"] == team_a) & (df["id_2"] == team_b))
+                 | ((df["id_1"] == team_b) & (df["id_2"] == team_a)))]
+
     if past.empty:
         return prior_wins / prior_games  # 0.5
 
-    wins = (past["winner"] == team_a).sum()
+    wins = (past["winner_id"] == team_a).sum()
     games = len(past)
 
     return (wins + prior_wins) / (games + prior_games)
 
 
 def build_live_features(team_a, team_b, match_date):
-    team_a = str(team_a).strip()
-    team_b = str(team_b).strip()
-
-    a_form = team_form(team_a, match_date)
-    b_form = team_form(team_b, match_date)
-    h2h = head_to_head(team_a, team_b, match_date)
-
-    elo = elo_as_of(match_date)
-    elo_a = float(elo.get(team_a, 1500.0))
-    elo_b = float(elo.get(team_b, 1500.0))
+    """
+    Features for `team_a` vs `team_b` (names or aliases). Raises
+    UnknownTeamError for names not in the team registry.
+    """
+    return build_live_features_by_id(TEAMS.id(team_a), TEAMS.id(team_b),
+                                     match_date)
+
+
+def build_live_features_by_id(team_a: int, team_b: int, match_date,
+                              state: LiveState | None = None):
+    """
+    `state` defaults to the served live state; the backtest passes its own
+    walk-forward state instead. Dates the state doesn't cover fall back to
+    the full history.
+    """
+    state = live() if state is None else state
+    # All reads from one state under its lock, so a result ingested
+    # meanwhile is either in every feature or in none.
+    with state.lock:
+        if state.covers(match_date):
+            # A team registered after this state was built has no rating.
+            for team in (team_a, team_b):
+                if not state.knows(team):
+                    raise UnknownTeamError(TEAMS.name(team))
+        a_form = team_form(team_a, match_date, state)
+        b_form = team_form(team_b, match_date, state)
+        h2h = head_to_head(team_a, team_b, match_date, state)
+
+        elo = state.elo if state.covers(match_date) else elo_as_of(match_date)
+        elo_a = float(elo[team_a])
+        elo_b = float(elo[team_b])
 
     MIN_ELO = 1450.0
     MAX_ELO = 1950.0
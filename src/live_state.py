@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.live_elo import MatchHistory, initial_ratings, update_ratings
+from src.runtime import current
+from src.teams import TEAMS
+
+ROLLING_N = 10
+H2H_YEARS = 3
+
+LOG_PATH = "data/ingested_matches.jsonl"
+
+
+class LiveState:
+    """
+    Everything the live features need, as of just after the latest known
+    match: Elo ratings, last-N form windows, recent head-to-head results and
+    played-match counts, all indexed by team ID. `update` is O(1) in the
+    length of the history.
+
+    Only valid for queries dated after `last_date`; anything earlier has to
+    go through the full history.
+
+    `update` holds `lock` while it applies a result. Readers that need
+    several fields to agree (one feature row) hold it across all their
+    reads, so they see each result either fully applied or not at all.
+    """
+
+    def __init__(self) -> None:
+        self.elo: np.ndarray = initial_ratings()
+        self.played: np.ndarray = np.zeros(len(TEAMS), dtype=np.int64)
+        self.form: List[Deque[int]] = [
+            deque(maxlen=ROLLING_N) for _ in range(len(TEAMS))
+        ]
+        self.h2h: Dict[Tuple[int, int], Deque[Tuple[pd.Timestamp, int]]] = (
+            defaultdict(deque))
+        self.match_ids: set[str] = set()
+        self.last_date: Optional[pd.Timestamp] = None
+        # Reentrant: the record readers below take it again.
+        self.lock = threading.RLock()
+
+    def covers(self, as_of) -> bool:
+        return self.last_date is None or pd.Timestamp(as_of) > self.last_date
+
+    def accepts(self, date) -> bool:
+        """Results can only be applied in chronological order."""
+        return self.last_date is None or pd.Timestamp(date) >= self.last_date
+
+    def knows(self, team: int) -> bool:
+        """Whether `team` was registered when this state last grew."""
+        return 0 <= team < len(self.elo)
+
+    def _grow(self) -> None:
+        # A debutant was registered after this state was built.
+        n = len(TEAMS)
+        if n > len(self.elo):
+            self.elo = np.concatenate([self.elo, initial_ratings()[len(self.elo):]])
+            self.played = np.concatenate(
+                [self.played, np.zeros(n - len(self.played), dtype=np.int64)])
+            self.form.extend(
+                deque(maxlen=ROLLING_N) for _ in range(n - len(self.form)))
+
+    def update(self, match_id: str, date, team_1: int, team_2: int,
+               winner: int) -> None:
+        date = pd.Timestamp(date)
+        with self.lock:
+            self._grow()
+
+            update_ratings(self.elo, team_1, team_2, winner == team_1)
+
+            self.form[team_1].append(1 if winner == team_1 else 0)
+            self.form[team_2].append(1 if winner == team_2 else 0)
+
+            # Anything older than H2H_YEARS before this match can never be
+            # inside the window of a query dated after it.
+            cutoff = date - pd.DateOffset(years=H2H_YEARS)
+            games = self.h2h[_pair(team_1, team_2)]
+            games.append((date, winner))
+            while games and games[0][0] < cutoff:
+                games.popleft()
+
+            self.played[team_1] += 1
+            self.played[team_2] += 1
+
+            self.match_ids.add(str(match_id))
+            self.last_date = date
+
+    def form_record(self, team: int) -> Tuple[int, int]:
+        """(wins, games) over the team's last ROLLING_N matches."""
+        with self.lock:
+            if team >= len(self.form):
+                return 0, 0
+            window = self.form[team]
+            return sum(window), len(window)
+
+    def h2h_record(self, team_a: int, team_b: int, as_of) -> Tuple[int, int]:
+        """(wins for team_a, games) in the H2H_YEARS before `as_of`."""
+        cutoff = pd.Timestamp(as_of) - pd.DateOffset(years=H2H_YEARS)
+        with self.lock:
+            games = self.h2h.get(_pair(team_a, team_b))
+            if not games:
+                return 0, 0
+            wins = n = 0
+            for d, w in games:
+                if d >= cutoff:
+                    n += 1
+                    wins += w == team_a
+            return wins, n
+
+
+def _pair(a: int, b: int) -> Tuple[int, int]:
+    return (a, b) if a <= b else (b, a)
+
+
+def read_log(path: str = LOG_PATH) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_log(row: dict, path: str = LOG_PATH) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def build_live_state(matches: MatchHistory) -> LiveState:
+    """State after every match in `matches`, plus the ingestion log."""
+    state = LiveState()
+    for r in matches.history().itertuples(index=False):
+        state.update(r.match_id, r.date, r.id_1, r.id_2, r.winner_id)
+    replay_log(matches, state)
+    return state
+
+
+def replay_log(matches: MatchHistory, state: LiveState) -> int:
+    """
+    Apply logged results `state` doesn't know yet to it and to `matches`.
+    Returns the number applied.
+    """
+    applied = 0
+    for row in read_log():
+        if str(row["match_id"]) in state.match_ids:
+            # Already part of a regenerated matches CSV (or replayed before).
+            continue
+        if not state.accepts(row["date"]):
+            print(f"live_state: skipping out-of-order logged match "
+                  f"{row['match_id']} ({row['date']})")
+            continue
+        matches.append(row)
+        state.update(row["match_id"], row["date"], TEAMS.add(row["team_1"]),
+                     TEAMS.add(row["team_2"]), TEAMS.id(row["winner"]))
+        applied += 1
+    return applied
+
+
+def live() -> LiveState:
+    """The served live state (see src/runtime.py)."""
+    return current().live
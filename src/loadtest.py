@@ -0,0 +1,261 @@
+"""
+HTTP load test for api.py.
+
+Starts the app with uvicorn on a free local port (or targets --url), sends
+an open-loop mix of /predict and /simulate requests at a target rate from
+async clients, and reports latency percentiles, throughput and error rate
+per endpoint as JSON.
+
+Requests are scheduled at fixed arrival times regardless of how fast the
+server answers, so a saturated server shows up as growing latency rather
+than a silently lower request rate.
+
+Usage:
+    python -m src.loadtest                                  # 20 req/s for 15s
+    python -m src.loadtest --rate 50 --duration 30 --mix predict=0.95,simulate=0.05
+    python -m src.loadtest --url http://localhost:3000 --out load.json
+
+Needs httpx (pip install httpx).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from src.tournament import compile_format
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional tool dependency
+    httpx = None
+
+CONFIG_PATH = "data/t20wc2026_config.json"
+
+DEFAULT_MIX = "predict=0.9,simulate=0.1"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("predict", "simulate"):
+            raise ValueError(f"unknown endpoint {name!r} in --mix")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("--mix weights must add up to more than 0")
+    return {k: v / total for k, v in mix.items()}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, log_path: str) -> subprocess.Popen:
+    # The handlers print debug lines per call; keep them out of the report.
+    with open(log_path, "w") as log:
+        return subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "api:app", "--host",
+                "127.0.0.1", "--port",
+                str(port), "--log-level", "warning"
+            ],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+async def wait_healthy(client: "httpx.AsyncClient", timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"server did not become healthy within {timeout}s")
+
+
+def make_payloads(teams: List[str], date: str, sim_n: int,
+                  rng: np.random.Generator):
+    """Endpoint -> function returning the next request body."""
+
+    def predict():
+        a, b = rng.choice(teams, 2, replace=False)
+        return {"team_a": str(a), "team_b": str(b), "date": date}
+
+    def simulate():
+        return {"n_sims": sim_n, "seed": int(rng.integers(1 << 31))}
+
+    return {"predict": predict, "simulate": simulate}
+
+
+async def run_load(client: "httpx.AsyncClient", mix: Dict[str, float],
+                   payloads, rate: float, duration: float,
+                   rng: np.random.Generator):
+    """
+    Fire requests at `rate`/s for `duration`s. Returns ({endpoint: [(latency,
+    ok), ...]}, elapsed seconds until the last response).
+    """
+    names = list(mix)
+    n = int(rate * duration)
+    picks = rng.choice(len(names), size=n, p=[mix[k] for k in names])
+    samples: Dict[str, list] = {k: [] for k in names}
+
+    async def one(name: str, body: dict) -> None:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(f"/{name}", json=body)
+            ok = r.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        samples[name].append((time.perf_counter() - t0, ok))
+
+    start = time.perf_counter()
+    tasks = []
+    for k in range(n):
+        delay = start + k / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name = names[picks[k]]
+        tasks.append(asyncio.create_task(one(name, payloads[name]())))
+    await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples: List[tuple], elapsed: float) -> dict:
+    if not samples:
+        return {"requests": 0}
+    lat = np.array([s[0] for s in samples]) * 1000.0
+    ok = np.array([s[1] for s in samples])
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {
+        "requests": int(len(lat)),
+        "errors": int((~ok).sum()),
+        "error_rate": float((~ok).mean()),
+        "throughput_rps": float(ok.sum() / elapsed),
+        "latency_ms": {
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "mean": float(lat.mean()),
+            "max": float(lat.max()),
+        },
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main_async(args) -> dict:
+    started = datetime.now().isoformat(timespec="seconds")
+    mix = parse_mix(args.mix)
+    rng = np.random.default_rng(args.seed)
+    with open(args.config, "r") as f:
+        plan = compile_format(json.load(f))
+    payloads = make_payloads(plan.teams, args.date or plan.as_of, args.sim_n,
+                             rng)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        server = start_server(port, args.server_log)
+        url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.connections)
+    try:
+        async with httpx.AsyncClient(base_url=url,
+                                     timeout=args.timeout,
+                                     limits=limits) as client:
+            await wait_healthy(client, args.startup_timeout)
+            if args.warmup:
+                # First calls load the model/probability caches.
+                await client.post("/predict", json=payloads["predict"]())
+                await client.post("/simulate", json=payloads["simulate"]())
+            samples, elapsed = await run_load(client, mix, payloads, args.rate,
+                                     args.duration, rng)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    everything = [s for v in samples.values() for s in v]
+    return {
+        "commit": git_commit(),
+        "started": started,
+        "url": url if args.url else "local",
+        "settings": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": mix,
+            "sim_n": args.sim_n,
+            "config": args.config,
+            "connections": args.connections,
+            "seed": args.seed,
+        },
+        "elapsed_s": elapsed,
+        "endpoints": {k: summarize(v, elapsed) for k, v in samples.items()},
+        "overall": summarize(everything, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test /predict + /simulate and report latency.")
+    parser.add_argument("--url", help="target a running server instead of "
+                        "starting one")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="total requests per second")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="endpoint=weight,... (default %(default)s)")
+    parser.add_argument("--sim-n", type=int, default=2000,
+                        help="n_sims per /simulate request")
+    parser.add_argument("--config", default=CONFIG_PATH,
+                        help="tournament whose teams /predict draws from")
+    parser.add_argument("--date", help="date for /predict (default: the "
+                        "config's as_of)")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-log", default=os.devnull,
+                        help="where the started server's output goes")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if httpx is None:
+        raise SystemExit("src.loadtest needs httpx: pip install httpx")
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
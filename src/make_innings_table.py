@@ -0,0 +1,102 @@
+"""
+Innings totals per match from the Cricsheet JSON, for the score model
+(src/score_model.py).
+
+Only full-length results are kept: 20-over matches with a winner, two
+innings, no reduced target and no DLS-style method. Balls are legal
+deliveries (wides and no-balls don't count).
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+
+import pandas as pd
+
+IN_DIR = "data/cricsheet_t20i_json"
+OUT_CSV = "data/innings_t20i_men.csv"
+
+OVERS = 20
+# Dismissals that don't cost the batting side a wicket.
+NOT_OUT = {"retired hurt", "retired not out"}
+
+
+def innings_totals(innings: dict) -> tuple[int, int, int]:
+    """(runs, legal balls, wickets) of one innings."""
+    runs = balls = wickets = 0
+    for over in innings.get("overs", []):
+        for d in over.get("deliveries", []):
+            runs += d.get("runs", {}).get("total", 0)
+            extras = d.get("extras", {})
+            if "wides" not in extras and "noballs" not in extras:
+                balls += 1
+            wickets += sum(1 for w in d.get("wickets", [])
+                           if w.get("kind") not in NOT_OUT)
+    return runs, balls, wickets
+
+
+def parse_innings(path: str) -> dict | None:
+    with open(path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+
+    info = obj.get("info", {})
+    outcome = info.get("outcome", {})
+    if (len(info.get("teams", [])) != 2 or not outcome.get("winner")
+            or outcome.get("method") or info.get("overs") != OVERS
+            or info.get("balls_per_over", 6) != 6):
+        return None
+
+    innings = [i for i in obj.get("innings", []) if not i.get("super_over")]
+    if len(innings) != 2:
+        return None
+    target = innings[1].get("target", {})
+    if target.get("overs", OVERS) != OVERS:
+        return None
+
+    (runs_1, balls_1, wkts_1), (runs_2, balls_2,
+                                wkts_2) = map(innings_totals, innings)
+    dates = info.get("dates", [])
+    return {
+        "match_id": os.path.splitext(os.path.basename(path))[0],
+        "date": dates[0] if dates else None,
+        "team_1": innings[0].get("team"),
+        "team_2": innings[1].get("team"),
+        "winner": outcome["winner"],
+        "runs_1": runs_1,
+        "balls_1": balls_1,
+        "wickets_1": wkts_1,
+        "runs_2": runs_2,
+        "balls_2": balls_2,
+        "wickets_2": wkts_2,
+    }
+
+
+def main() -> None:
+    paths = glob.glob(os.path.join(IN_DIR, "**/*.json"), recursive=True)
+    if not paths:
+        raise SystemExit(f"No JSON files found under {IN_DIR}")
+
+    rows = []
+    skipped = 0
+    for p in paths:
+        try:
+            row = parse_innings(p)
+        except (ValueError, KeyError, TypeError):
+            row = None
+        if row is None:
+            skipped += 1
+            continue
+        rows.append(row)
+
+    df = pd.DataFrame(rows).sort_values(["date", "match_id"])
+    df.to_csv(OUT_CSV, index=False)
+
+    print(f"Parsed files: {len(paths):,}")
+    print(f"Skipped (no result / shortened / malformed): {skipped:,}")
+    print(f"Saved innings pairs: {len(df):,}")
+    print(f"Output: {OUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
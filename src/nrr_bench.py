@@ -0,0 +1,101 @@
+"""
+What real NRR (`nrr="scores"`, src/score_model.py) costs per simulation.
+
+Runs the same simulations with the margin proxy and with sampled innings
+scores, best of `--reps` timings each, for every config whose tables rank on
+nrr (the score model changes nothing elsewhere). Exits non-zero if
+the score model makes a simulation more than `--max-slowdown` times slower
+(2x by default), so it can guard the hot loop in CI.
+
+Usage:
+    python -m src.nrr_bench
+    python -m src.nrr_bench --n 50000 --reps 5 --config data/asiacup2025_config.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.prob_cache import build_prob_matrix
+from src.score_model import load_score_model
+from src.simulate import ranks_on_nrr, run_counts
+from src.teams import TEAMS
+from src.tournament import compile_format
+
+CONFIGS = ["data/t20wc2026_config.json", "data/asiacup2025_config.json"]
+
+MAX_SLOWDOWN = 2.0
+
+
+def best_time(plan, probs, n: int, reps: int, scores):
+    """(fastest seconds of `reps` runs, results of the last run in %)."""
+    best = float("inf")
+    for r in range(reps):
+        t0 = time.perf_counter()
+        reached, wins = run_counts(plan, probs, n, np.random.default_rng(r),
+                                   scores=scores)
+        best = min(best, time.perf_counter() - t0)
+    return best, np.vstack([reached[1:], wins[None, :]]) / n * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the innings-score NRR model against the proxy.")
+    parser.add_argument("--config", action="append",
+                        help="tournament config (repeatable; default: the "
+                        "bundled ones)")
+    parser.add_argument("--n", type=int, default=100000,
+                        help="simulations per timing")
+    parser.add_argument("--reps", type=int, default=3)
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN)
+    args = parser.parse_args()
+
+    scores = load_score_model()
+    rows = []
+    for path in args.config or CONFIGS:
+        with open(path, "r") as f:
+            plan = compile_format(json.load(f))
+        if not ranks_on_nrr(plan):
+            print(f"skipping {plan.name}: no stage ranks on nrr")
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            probs = build_prob_matrix(TEAMS.ids(plan.teams),
+                                      datetime.fromisoformat(plan.as_of))
+
+        proxy_s, proxy_pct = best_time(plan, probs, args.n, args.reps, None)
+        scores_s, scores_pct = best_time(plan, probs, args.n, args.reps,
+                                         scores)
+        rows.append({
+            "config": plan.name,
+            "proxy us/sim": proxy_s / args.n * 1e6,
+            "scores us/sim": scores_s / args.n * 1e6,
+            "slowdown": scores_s / proxy_s,
+            # How far real NRR moves the stage percentages.
+            "max pct change": float(np.abs(scores_pct - proxy_pct).max()),
+        })
+
+    if not rows:
+        raise SystemExit("no config ranks on nrr, nothing to time")
+    report = pd.DataFrame(rows)
+    pd.set_option("display.width", 120)
+    print(f"{args.n} sims, best of {args.reps}")
+    print(report.round(3).to_string(index=False))
+
+    worst = report["slowdown"].max()
+    if worst > args.max_slowdown:
+        print(f"FAIL: score model is {worst:.2f}x slower per sim "
+              f"(limit {args.max_slowdown:.1f}x)")
+        sys.exit(1)
+    print(f"ok: at most {worst:.2f}x per sim (limit {args.max_slowdown:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Incremental runner for the data build.
+
+Each stage declares the files it reads, the files it writes and the source
+modules that implement it. A stage is skipped when the fingerprint of its
+inputs + code matches the one recorded on its last successful run and all
+of its outputs still exist. Stages whose dependencies are satisfied run in
+parallel.
+
+Usage:
+    python -m src.pipeline                 # run whatever is stale
+    python -m src.pipeline --force elo     # rebuild elo (and everything after it)
+    python -m src.pipeline --dry-run       # only report what would run
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+STATE_PATH = "data/.pipeline_state.json"
+
+
+def _run_download() -> None:
+    from src.download_cricsheet import main
+    main()
+
+
+def _run_matches() -> None:
+    from src.make_matches_table import main
+    main()
+
+
+def _run_innings() -> None:
+    from src.make_innings_table import main
+    main()
+
+
+def _run_elo() -> None:
+    from src.build_elo import main
+    main()
+
+
+def _run_features() -> None:
+    from src.build_features import main
+    main()
+
+
+def _run_train() -> None:
+    from src.train import main
+    main()
+
+
+def _run_publish() -> None:
+    from src.serving import publish
+    print(f"[pipeline] serving version {publish()}")
+
+
+def _run_snapshots() -> None:
+    from datetime import datetime
+    from src.build_snapshots import build_snapshot, config_dates
+    for day in config_dates():
+        build_snapshot(datetime.fromisoformat(day))
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], None]
+    inputs: List[str]
+    outputs: List[str]
+    code: List[str]
+    deps: List[str] = field(default_factory=list)
+    env: List[str] = field(default_factory=list)
+
+
+STAGES: List[Stage] = [
+    Stage(
+        name="download",
+        run=_run_download,
+        inputs=[],
+        outputs=["data/cricsheet_t20i_json"],
+        code=["src/download_cricsheet.py"],
+        env=["T20I_JSON_ZIP_URL"],
+    ),
+    Stage(
+        name="matches",
+        run=_run_matches,
+        inputs=["data/cricsheet_t20i_json"],
+        outputs=["data/matches_t20i_men.csv"],
+        code=["src/make_matches_table.py"],
+        deps=["download"],
+    ),
+    Stage(
+        name="innings",
+        run=_run_innings,
+        inputs=["data/cricsheet_t20i_json"],
+        outputs=["data/innings_t20i_men.csv"],
+        code=["src/make_innings_table.py"],
+        deps=["download"],
+    ),
+    Stage(
+        name="elo",
+        run=_run_elo,
+        inputs=["data/matches_t20i_men.csv"],
+        outputs=["data/elo_matches.csv"],
+        code=["src/build_elo.py", "src/elo.py", "src/teams.py"],
+        deps=["matches"],
+    ),
+    Stage(
+        name="features",
+        run=_run_features,
+        inputs=["data/matches_t20i_men.csv", "data/elo_matches.csv"],
+        outputs=["data/features_t20i_men.csv"],
+        code=["src/build_features.py", "src/features.py", "src/teams.py"],
+        deps=["matches", "elo"],
+    ),
+    Stage(
+        name="train",
+        run=_run_train,
+        inputs=["data/features_t20i_men.csv"],
+        outputs=["artifacts/model.pkl", "artifacts/meta.json"],
+        code=["src/train.py"],
+        deps=["features"],
+    ),
+    Stage(
+        name="publish",
+        run=_run_publish,
+        inputs=["artifacts/model.pkl", "data/matches_t20i_men.csv"],
+        outputs=["artifacts/CURRENT"],
+        code=["src/serving.py", "src/teams.py"],
+        deps=["matches", "train"],
+    ),
+    Stage(
+        name="snapshots",
+        run=_run_snapshots,
+        # Snapshots come from the live state, which replays the ingestion
+        # log (LOG_PATH in src/live_state.py) on top of the matches table.
+        inputs=["artifacts/model.pkl", "data/matches_t20i_men.csv",
+                "data/ingested_matches.jsonl"] +
+        sorted(glob.glob("data/*_config.json")),
+        outputs=["artifacts/snapshots"],
+        code=["src/build_snapshots.py", "src/snapshot_store.py",
+              "src/live_features.py", "src/live_elo.py", "src/live_state.py",
+              "src/predict.py", "src/prob_cache.py", "src/teams.py"],
+        deps=["matches", "train", "publish"],
+    ),
+]
+
+
+def _hash_path(h: "hashlib._Hash", path: str) -> None:
+    """
+    Files are hashed by content. Directories (the raw Cricsheet dump is a
+    few thousand JSON files) are hashed by name, size and mtime only.
+    """
+    h.update(path.encode())
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                p = os.path.join(root, name)
+                st = os.stat(p)
+                h.update(f"{os.path.relpath(p, path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    elif os.path.isfile(path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        h.update(b"<missing>")
+
+
+def fingerprint(stage: Stage) -> str:
+    h = hashlib.sha256()
+    for path in stage.code + stage.inputs:
+        _hash_path(h, path)
+    for var in stage.env:
+        h.update(f"{var}={os.getenv(var, '')}".encode())
+    return h.hexdigest()
+
+
+def _outputs_exist(stage: Stage) -> bool:
+    for path in stage.outputs:
+        if os.path.isdir(path):
+            if not os.listdir(path):
+                return False
+        elif not os.path.exists(path):
+            return False
+    return True
+
+
+def load_state() -> Dict[str, str]:
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, str]) -> None:
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def _downstream(names: List[str]) -> set[str]:
+    """All stages that (transitively) depend on any of `names`, inclusive."""
+    out = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for s in STAGES:
+            if s.name not in out and any(d in out for d in s.deps):
+                out.add(s.name)
+                changed = True
+    return out
+
+
+def run_pipeline(force: List[str] | None = None,
+                 jobs: int = 2,
+                 dry_run: bool = False) -> Dict[str, dict]:
+    """
+    Run every stale stage in dependency order.
+
+    A stage is only considered once its dependencies have finished, so a
+    rebuilt upstream output correctly invalidates everything that reads it.
+    """
+    by_name = {s.name: s for s in STAGES}
+    unknown = set(force or []) - set(by_name)
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    forced = _downstream(force or [])
+    state = load_state()
+    report: Dict[str, dict] = {}
+
+    pending = {s.name for s in STAGES}
+    running: Dict[Future, str] = {}
+    failed: set[str] = set()
+
+    def decide(stage: Stage) -> str:
+        if stage.name in forced:
+            return "run"
+        # Nothing to fetch from: keep whatever is already on disk.
+        if stage.env and not all(os.getenv(v) for v in stage.env):
+            return "skip" if _outputs_exist(stage) else "run"
+        if state.get(stage.name) == fingerprint(stage) and _outputs_exist(stage):
+            return "skip"
+        return "run"
+
+    def timed(stage: Stage) -> float:
+        t0 = time.perf_counter()
+        stage.run()
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            ready = [
+                by_name[n] for n in sorted(pending)
+                if all(d in report for d in by_name[n].deps)
+            ]
+            for stage in ready:
+                pending.discard(stage.name)
+                if any(d in failed for d in stage.deps):
+                    report[stage.name] = {"status": "blocked", "seconds": 0.0}
+                    failed.add(stage.name)
+                    continue
+
+                action = decide(stage)
+                if dry_run and any(report[d]["status"] == "stale"
+                                   for d in stage.deps):
+                    action = "run"
+                if action == "skip" or dry_run:
+                    status = "up-to-date" if action == "skip" else "stale"
+                    report[stage.name] = {"status": status, "seconds": 0.0}
+                    continue
+
+                print(f"[pipeline] running {stage.name}")
+                running[pool.submit(timed, stage)] = stage.name
+
+            if not running:
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    seconds = fut.result()
+                except BaseException as e:  # noqa: BLE001 - report and carry on
+                    print(f"[pipeline] {name} failed: {e!r}")
+                    report[name] = {"status": "failed", "seconds": 0.0}
+                    failed.add(name)
+                    state.pop(name, None)
+                    continue
+
+                # Re-fingerprint: a stage may legitimately touch its own inputs
+                # (e.g. download writes the dir that `matches` hashes).
+                state[name] = fingerprint(by_name[name])
+                report[name] = {"status": "ran", "seconds": round(seconds, 3)}
+                save_state(state)
+
+    return {s.name: report[s.name] for s in STAGES}
+
+
+def print_report(report: Dict[str, dict]) -> None:
+    width = max(len(n) for n in report)
+    total = 0.0
+    print("\nstage".ljust(width + 2), "status".ljust(12), "seconds")
+    for name, r in report.items():
+        total += r["seconds"]
+        print(name.ljust(width + 1), r["status"].ljust(12), f"{r['seconds']:.3f}")
+    print("total".ljust(width + 1), "".ljust(12), f"{total:.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the data pipeline")
+    parser.add_argument("--force",
+                        nargs="*",
+                        default=[],
+                        help="stages to rebuild regardless of fingerprints")
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    report = run_pipeline(force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    print_report(report)
+
+    if any(r["status"] in ("failed", "blocked") for r in report.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
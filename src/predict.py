@@ -2,9 +2,14 @@ import joblib
 import pandas as pd
 import numpy as np
 
+from src.runtime import current
+
 MODEL_PATH = "artifacts/model.pkl"
 
-model = joblib.load(MODEL_PATH)
+
+def load_model(path: str = MODEL_PATH):
+    return joblib.load(path)
+
 
 FEATURES = [
     "team_a_form",
@@ -16,6 +21,17 @@ FEATURES = [
     "elo_diff",
 ]
 
+# Blend (Elo-dominant)
+ELO_WEIGHT = 0.65  # 🔑 main control knob (0.6–0.7 is realistic)
+
+
+def blend(ml_p, elo_diff):
+    """Elo/ML blend served by /predict; works on scalars or arrays."""
+    # elo_diff is already scaled (≈ -1 .. +1)
+    elo_p = 1.0 / (1.0 + np.exp(-elo_diff))
+    p = ELO_WEIGHT * elo_p + (1.0 - ELO_WEIGHT) * ml_p
+    return np.clip(p, 0.01, 0.99), elo_p
+
 
 def predict_proba(features: dict) -> float:
     """
@@ -24,15 +40,16 @@ def predict_proba(features: dict) -> float:
     """
     # ML-based probability
     df = pd.DataFrame([features])
-    ml_p = model.predict_proba(df[FEATURES])[:, 1][0]
-
-    # elo_diff is already scaled (≈ -1 .. +1)
-    elo_p = 1.0 / (1.0 + np.exp(-features["elo_diff"]))
+    ml_p = current().model.predict_proba(df[FEATURES])[:, 1][0]
 
-    # Blend (Elo-dominant)
-    ELO_WEIGHT = 0.65  # 🔑 main control knob (0.6–0.7 is realistic)
-    p = ELO_WEIGHT * elo_p + (1.0 - ELO_WEIGHT) * ml_p
+    p, elo_p = blend(ml_p, features["elo_diff"])
     print("predict_proba: ml_p=", round(float(ml_p), 4), "elo_p=",
           round(float(elo_p), 4), "final=", round(float(p), 4))
 
-    return float(min(max(p, 0.01), 0.99))
+    return float(p)
+
+
+def predict_proba_batch(features: pd.DataFrame) -> np.ndarray:
+    """`predict_proba` for many feature rows at once (no debug output)."""
+    ml_p = current().model.predict_proba(features[FEATURES])[:, 1]
+    return blend(ml_p, features["elo_diff"].to_numpy())[0]
@@ -3,13 +3,14 @@ from __future__ import annotations
 from datetime import datetime
 from itertools import permutations
 from math import pow
-from src.live_features import build_live_features
+from src.live_elo import history
+from src.live_features import build_live_features_by_id
+from src.live_state import LiveState, live
 from src.predict import predict_proba
+from src.runtime import current
+from src.teams import TEAMS, UnknownTeamError
 
-import pandas as pd
-
-MATCHES_PATH = "data/matches_t20i_men.csv"
-HIST = pd.read_csv(MATCHES_PATH, parse_dates=["date"])
+import numpy as np
 
 # Tuning knobs (start here)
 MIN_MATCHES_START = 10  # below this, rely almost entirely on Elo
@@ -17,15 +18,29 @@ MIN_MATCHES_FULL = 50  # at/above this, rely mostly on ML
 PROB_CLAMP_LOW = 0.05
 PROB_CLAMP_HIGH = 0.95
 
+# Blended probabilities are cached per served version in
+# `current().prob_cache` (src/serving.py), keyed by (as_of date, team_a id,
+# team_b id). Entries are dropped by `invalidate_teams` whenever a new result
+# involving either team arrives.
+
 
 def elo_expected(elo_a: float, elo_b: float) -> float:
     """Classic Elo expected win probability."""
     return 1 / (1 + pow(10, (elo_b - elo_a) / 400))
 
 
-def matches_played(team: str, as_of_date: datetime) -> int:
-    past = HIST[HIST["date"] < as_of_date]
-    tm = past[(past["team_1"] == team) | (past["team_2"] == team)]
+def matches_played(team: int, as_of_date: datetime,
+                   state: LiveState | None = None) -> int:
+    state = live() if state is None else state
+    with state.lock:
+        if state.covers(as_of_date):
+            if not state.knows(team):
+                raise UnknownTeamError(TEAMS.name(team))
+            return int(state.played[team])
+
+    hist = history()
+    past = hist[hist["date"] < as_of_date]
+    tm = past[(past["id_1"] == team) | (past["id_2"] == team)]
     return int(len(tm))
 
 
@@ -46,10 +61,19 @@ def clamp_prob(p: float) -> float:
     return max(PROB_CLAMP_LOW, min(PROB_CLAMP_HIGH, p))
 
 
-def build_prob_cache(teams: list[str],
-                     as_of_date: datetime) -> dict[tuple[str, str], float]:
+def blend_probs(p_ml: np.ndarray, p_elo: np.ndarray,
+                n_matches: np.ndarray) -> np.ndarray:
+    """Vectorised `ml_weight` blend + clamp, as used by build_prob_matrix."""
+    w = np.clip((np.asarray(n_matches) - MIN_MATCHES_START) /
+                (MIN_MATCHES_FULL - MIN_MATCHES_START), 0.0, 1.0)
+    return np.clip(w * p_ml + (1.0 - w) * p_elo, PROB_CLAMP_LOW,
+                   PROB_CLAMP_HIGH)
+
+
+def build_prob_matrix(team_ids: np.ndarray, as_of_date: datetime) -> np.ndarray:
     """
-    Precompute P(team_a beats team_b) for all ordered pairs in `teams`.
+    Precompute P(team_a beats team_b) for all ordered pairs in `team_ids`.
+    Entry [i, j] is the probability that team_ids[i] beats team_ids[j].
 
     Strategy:
     - Compute Elo expected win prob p_elo from features
@@ -57,13 +81,37 @@ def build_prob_cache(teams: list[str],
     - Blend them based on minimum history between the two teams
       (less history => rely more on Elo)
     """
-    cache: dict[tuple[str, str], float] = {}
+    n = len(team_ids)
+    team_ids = np.asarray(team_ids, dtype=np.int64)
+
+    version = current()
+    cache = version.prob_cache
+    snap = version.snapshots.get(as_of_date)
+    if snap is not None:
+        rows = snap.rows(team_ids)
+        if (rows >= 0).all():
+            probs = np.array(snap.simulate[np.ix_(rows, rows)])
+            probs[team_ids[:, None] == team_ids[None, :]] = 0.5
+            return probs
+
+    probs = np.full((n, n), 0.5)
+    day = as_of_date.date().isoformat()
 
     # Precompute match counts once for speed
-    played = {t: matches_played(t, as_of_date) for t in teams}
+    played = [matches_played(t, as_of_date) for t in team_ids]
+
+    for i, j in permutations(range(n), 2):
+        a = int(team_ids[i])
+        b = int(team_ids[j])
+        if a == b:
+            # Same team under two names (e.g. an alias); a coin flip.
+            continue
+        hit = cache.get((day, a, b))
+        if hit is not None:
+            probs[i, j] = hit
+            continue
 
-    for a, b in permutations(teams, 2):
-        feats = build_live_features(a, b, as_of_date)
+        feats = build_live_features_by_id(a, b, as_of_date)
 
         # Elo-only baseline probability
         p_elo = elo_expected(float(feats["elo_a"]), float(feats["elo_b"]))
@@ -72,9 +120,34 @@ def build_prob_cache(teams: list[str],
         p_ml = float(predict_proba(feats))
 
         # Weight ML by the weaker-history team in the pairing
-        w = ml_weight(min(played[a], played[b]))
+        probs[i, j] = blend_probs(p_ml, p_elo, min(played[i], played[j]))
+        cache[(day, a, b)] = probs[i, j]
 
-        p = w * p_ml + (1.0 - w) * p_elo
-        cache[(a, b)] = clamp_prob(p)
+    return probs
 
-    return cache
+
+def build_prob_cache(teams: list[str],
+                     as_of_date: datetime) -> dict[tuple[str, str], float]:
+    """`build_prob_matrix` keyed by team name pairs."""
+    probs = build_prob_matrix(TEAMS.ids(teams), as_of_date)
+    return {(a, b): float(probs[i, j])
+            for (i, a), (j, b) in permutations(enumerate(teams), 2)}
+
+
+def invalidate_teams(team_ids: list[int], after: datetime,
+                     cache: dict | None = None) -> int:
+    """
+    Drop cached probabilities for pairings that involve any of `team_ids`
+    and are dated after `after` from `cache` (default: the served
+    version's). Returns the number of entries removed.
+    """
+    cache = current().prob_cache if cache is None else cache
+    day = after.date().isoformat()
+    # Snapshot the keys: concurrent requests keep inserting.
+    stale = [
+        k for k in list(cache)
+        if k[0] > day and (k[1] in team_ids or k[2] in team_ids)
+    ]
+    for k in stale:
+        cache.pop(k, None)
+    return len(stale)
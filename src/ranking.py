@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+TIEBREAKERS = ("points", "wins", "head_to_head", "nrr", "random")
+
+# What rank_table used before tiebreakers were configurable.
+DEFAULT_TIEBREAKERS = ("points", "nrr")
+
+
+def validate_tiebreakers(tiebreakers: Sequence[str]) -> list[str]:
+    chain = list(tiebreakers) or list(DEFAULT_TIEBREAKERS)
+    unknown = [t for t in chain if t not in TIEBREAKERS]
+    if unknown:
+        raise ValueError(f"Unknown tiebreaker(s): {', '.join(unknown)} "
+                         f"(expected any of {', '.join(TIEBREAKERS)})")
+    return chain
+
+
+def rank_tables(points: np.ndarray,
+                wins: np.ndarray,
+                nrr: np.ndarray,
+                h2h: np.ndarray,
+                tiebreakers: Sequence[str],
+                rng: np.random.Generator) -> np.ndarray:
+    """
+    Rank a batch of round-robin tables.
+
+    points, wins, nrr: (n_sims, n_teams)
+    h2h:               (n_sims, n_teams, n_teams), h2h[s, i, j] = number of
+                       times team i beat team j in simulation s
+
+    Tiebreakers are applied in order. "head_to_head" counts wins against
+    the teams still level on every earlier criterion; "random" is a draw
+    from `rng`. Teams still level on the whole chain are ordered by a
+    random draw from `rng` too, so no table position is favoured.
+
+    Returns finishing positions, shape (n_sims, n_teams), 0 = top.
+    """
+    n_sims, n_teams = points.shape
+    keys: list[np.ndarray] = []
+
+    chain = validate_tiebreakers(tiebreakers)
+    for name in chain:
+        if name == "points":
+            key = points
+        elif name == "wins":
+            key = wins
+        elif name == "nrr":
+            key = nrr
+        elif name == "random":
+            key = rng.random((n_sims, n_teams))
+        else:  # head_to_head
+            tied = np.ones((n_sims, n_teams, n_teams), dtype=bool)
+            for k in keys:
+                tied &= k[:, :, None] == k[:, None, :]
+            key = (h2h * tied).sum(axis=2)
+        keys.append(key)
+
+    if "random" not in chain:
+        # Break whatever the chain leaves level without favouring the
+        # teams listed first.
+        keys.append(rng.random((n_sims, n_teams)))
+
+    # lexsort: last key is primary, ascending -> negate for "higher is better".
+    order = np.lexsort([-k for k in reversed(keys)], axis=-1)
+
+    positions = np.empty((n_sims, n_teams), dtype=np.int8)
+    np.put_along_axis(positions,
+                      order,
+                      np.arange(n_teams, dtype=np.int8)[None, :],
+                      axis=1)
+    return positions
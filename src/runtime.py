@@ -0,0 +1,61 @@
+"""
+Which model + data version is being served.
+
+The active version (see src/serving.py) is swapped as a whole by a reload.
+A request pins the version that was active when it started, so everything
+it computes comes from one version even if a reload lands half way:
+
+    with pinned() as version:
+        ...  # current() is `version` here, in this thread
+
+Code outside a request (CLIs, the pipeline) just uses the active version,
+loaded on first use.
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Held while results are ingested and while a reload swaps versions, so a
+# result is never applied to a version that is about to be replaced.
+# Reentrant so a caller can hold it across an ingest and read back the
+# version it went into.
+WRITE_LOCK = threading.RLock()
+
+_active = None
+_init_lock = threading.Lock()
+_pinned: ContextVar = ContextVar("serving_version", default=None)
+
+
+def active():
+    """The version new requests get (loaded on first use)."""
+    global _active
+    if _active is None:
+        with _init_lock:
+            if _active is None:
+                # Imported here: serving builds on the modules that use us.
+                from src.serving import load_version
+                _active = load_version()
+    return _active
+
+
+def current():
+    """The pinned version inside a request, the active one otherwise."""
+    version = _pinned.get()
+    return version if version is not None else active()
+
+
+def activate(version) -> None:
+    global _active
+    _active = version
+
+
+@contextmanager
+def pinned():
+    version = current()
+    token = _pinned.set(version)
+    try:
+        yield version
+    finally:
+        _pinned.reset(token)
@@ -0,0 +1,134 @@
+"""
+Sources of uniform draws for the tournament Monte Carlo.
+
+The simulator asks its sampler for one column of U(0, 1) draws per random
+decision (a fixture's result, its NRR margin, a washout, a knockout match),
+always in the same order for a given plan. That "dimension" view is what
+lets the variance-reduced modes line draws up across simulations:
+
+  plain       independent draws (the original behaviour)
+  antithetic  the second half of every batch uses 1 - u of the first half
+  stratified  every dimension is a Latin hypercube over the batch: exactly
+              one draw in each of the n strata [k/n, (k+1)/n)
+  sobol       scrambled Sobol points, one coordinate per dimension
+              (needs scipy)
+"""
+from __future__ import annotations
+
+import warnings
+from typing import Callable
+
+import numpy as np
+
+try:
+    from scipy.stats import qmc
+except ImportError:  # pragma: no cover - optional dependency
+    qmc = None
+
+SAMPLING_MODES = ("plain", "antithetic", "stratified", "sobol")
+
+
+def validate_sampling(mode: str) -> str:
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode {mode!r} "
+                         f"(expected any of {', '.join(SAMPLING_MODES)})")
+    return mode
+
+
+class Sampler:
+    """Independent uniforms."""
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.n = 0
+
+    def start(self, n: int) -> None:
+        """Begin a batch of `n` simulations."""
+        self.n = n
+
+    def uniform(self, k: int = 1) -> np.ndarray:
+        """`k` dimensions of draws, shape (n, k)."""
+        return self.rng.random((self.n, k))
+
+
+class AntitheticSampler(Sampler):
+
+    def uniform(self, k: int = 1) -> np.ndarray:
+        half = (self.n + 1) // 2
+        u = self.rng.random((half, k))
+        return np.concatenate([u, 1.0 - u])[:self.n]
+
+
+class StratifiedSampler(Sampler):
+
+    def uniform(self, k: int = 1) -> np.ndarray:
+        strata = np.argsort(self.rng.random((self.n, k)), axis=0)
+        return (strata + self.rng.random((self.n, k))) / self.n
+
+
+class SobolSampler(Sampler):
+    """
+    Needs the number of dimensions per simulation up front (see
+    `count_dimensions`). Batches continue the same scrambled sequence, so
+    power-of-two batch sizes keep its balance properties.
+    """
+
+    def __init__(self, rng: np.random.Generator, dims: int):
+        super().__init__(rng)
+        self.engine = qmc.Sobol(d=max(dims, 1), scramble=True, seed=rng)
+        self.points = np.empty((0, 0))
+        self.col = 0
+
+    def start(self, n: int) -> None:
+        super().start(n)
+        with warnings.catch_warnings():
+            # Non power-of-two batches (the last one) are still unbiased.
+            warnings.simplefilter("ignore", UserWarning)
+            self.points = self.engine.random(n)
+        self.col = 0
+
+    def uniform(self, k: int = 1) -> np.ndarray:
+        if self.col + k > self.points.shape[1]:
+            raise RuntimeError("Sobol sampler ran out of dimensions")
+        out = self.points[:, self.col:self.col + k]
+        self.col += k
+        return out
+
+
+class _CountingSampler(Sampler):
+
+    def __init__(self, rng: np.random.Generator):
+        super().__init__(rng)
+        self.dims = 0
+
+    def uniform(self, k: int = 1) -> np.ndarray:
+        self.dims += k
+        return super().uniform(k)
+
+
+def count_dimensions(run: Callable[[Sampler], None],
+                     rng: np.random.Generator) -> int:
+    """Dimensions `run` consumes, found by running it once on a tiny batch."""
+    counter = _CountingSampler(rng)
+    run(counter)
+    return counter.dims
+
+
+def make_sampler(mode: str, rng: np.random.Generator,
+                 run: Callable[[Sampler], None] | None = None) -> Sampler:
+    """
+    Sampler for `mode` (raises ValueError). Sobol needs `run`, a function
+    that simulates a small batch with the given sampler, to size itself.
+    """
+    validate_sampling(mode)
+    if mode == "plain":
+        return Sampler(rng)
+    if mode == "antithetic":
+        return AntitheticSampler(rng)
+    if mode == "stratified":
+        return StratifiedSampler(rng)
+    if qmc is None:
+        raise ValueError("sobol sampling needs scipy (pip install scipy)")
+    # Size the engine with a throwaway generator so `rng` is untouched.
+    dims = count_dimensions(run, np.random.default_rng(0))
+    return SobolSampler(rng, dims)
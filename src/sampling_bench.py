@@ -0,0 +1,88 @@
+"""
+How many simulations each sampling mode saves.
+
+Every mode is run `--reps` times with `--n` simulations and different seeds;
+the spread of the estimates across repetitions is its standard error. Since
+the error shrinks like 1/sqrt(n), plain variance / mode variance is the
+factor by which the mode cuts the sims needed for the same error. The
+"per second" column also accounts for the mode's extra cost per sim.
+
+Usage:
+    python -m src.sampling_bench
+    python -m src.sampling_bench --n 8192 --reps 50 --config data/asiacup2025_config.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.prob_cache import build_prob_matrix
+from src.sampling import SAMPLING_MODES
+from src.simulate import run_counts
+from src.teams import TEAMS
+from src.tournament import compile_format
+
+CONFIG_PATH = "data/t20wc2026_config.json"
+
+
+def replicate(plan, probs, n: int, reps: int, sampling: str,
+              rao_blackwell: bool):
+    """(estimates (reps, n_stages + 1, n_teams) in %, seconds per rep)."""
+    out = []
+    t0 = time.perf_counter()
+    for r in range(reps):
+        reached, wins = run_counts(plan, probs, n, np.random.default_rng(r),
+                                   sampling, rao_blackwell)
+        out.append(np.vstack([reached[1:], wins[None, :]]) / n * 100)
+    return np.array(out), (time.perf_counter() - t0) / reps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Monte Carlo sampling modes at equal sims.")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--n", type=int, default=4096,
+                        help="simulations per repetition (powers of two "
+                        "suit sobol)")
+    parser.add_argument("--reps", type=int, default=30)
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        plan = compile_format(json.load(f))
+    with contextlib.redirect_stdout(io.StringIO()):
+        probs = build_prob_matrix(TEAMS.ids(plan.teams),
+                                  datetime.fromisoformat(plan.as_of))
+
+    metrics = [f"{s}_pct" for s in plan.stage_names[1:]] + ["win_pct"]
+    rows = []
+    base_var = base_sec = None
+    for sampling in SAMPLING_MODES:
+        for rb in (False, True):
+            est, sec = replicate(plan, probs, args.n, args.reps, sampling, rb)
+            # Mean over teams of the per-team variance, per metric.
+            var = est.var(axis=0, ddof=1).mean(axis=1)
+            if base_var is None:
+                base_var, base_sec = var, sec
+            row = {"sampling": sampling, "rao_blackwell": rb}
+            for m, v, b in zip(metrics, var, base_var):
+                row[f"{m} se"] = float(np.sqrt(v))
+                row[f"{m} x"] = float(b / v) if v > 0 else float("inf")
+            row["sec/rep"] = sec
+            row["win x per second"] = row["win_pct x"] * base_sec / sec
+            rows.append(row)
+
+    pd.set_option("display.width", 160)
+    print(f"{plan.name}: {args.reps} reps x {args.n} sims per mode; "
+          "'x' = sims saved vs plain for equal standard error")
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
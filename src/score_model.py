@@ -0,0 +1,181 @@
+"""
+Score-level match model, for real net run rate in simulated group tables.
+
+Fitted from the innings table (src/make_innings_table.py). Every historical
+result is seen from the winner's side as (runs scored, balls faced, runs
+conceded, balls bowled), with a side that was bowled out charged its full
+20 overs as the NRR rules do. Results are grouped by the winner's pre-match
+Elo win chance (data/elo_matches.csv), so mismatches give bigger margins
+than close games.
+
+Sampling draws, for every simulated match of a batch, one historical result
+from the group its win probability falls in. That is a single gather per
+match, and it keeps the joint shape of both innings (a chase ending early,
+a collapse) that independent runs/overs draws would lose.
+
+    python -m src.score_model         # per-group summary of the fit
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+INNINGS_CSV = "data/innings_t20i_men.csv"
+ELO_CSV = "data/elo_matches.csv"
+
+NRR_MODELS = ("proxy", "scores")
+
+# Group edges on the winner's pre-match win chance; groups with fewer than
+# MIN_GROUP results are merged into a neighbour.
+STRENGTH_EDGES = (0.4, 0.5, 0.6, 0.7, 0.8)
+MIN_GROUP = 50
+
+FULL_BALLS = 120
+
+
+def validate_nrr(mode: str) -> str:
+    if mode not in NRR_MODELS:
+        raise ValueError(f"Unknown nrr model {mode!r} "
+                         f"(expected any of {', '.join(NRR_MODELS)})")
+    return mode
+
+
+@dataclass
+class ScoreModel:
+    edges: np.ndarray  # (n_groups - 1,) win-chance group edges
+    starts: np.ndarray  # (n_groups,) first row of each group
+    counts: np.ndarray  # (n_groups,) rows in each group
+    # One row per historical result, winner's side, ordered by group.
+    runs_for: np.ndarray
+    balls_for: np.ndarray
+    runs_against: np.ndarray
+    balls_against: np.ndarray
+
+    def sample(self, p_winner: np.ndarray, u: np.ndarray):
+        """
+        Scores for a batch of results, given the winner's win probability
+        and one uniform per match: (winner runs, winner balls, loser runs,
+        loser balls), balls counted the NRR way.
+        """
+        g = np.searchsorted(self.edges, p_winner, side="right")
+        k = self.starts[g] + np.minimum((u * self.counts[g]).astype(np.int64),
+                                        self.counts[g] - 1)
+        return (self.runs_for[k], self.balls_for[k], self.runs_against[k],
+                self.balls_against[k])
+
+    def summary(self) -> pd.DataFrame:
+        lo = np.concatenate([[0.0], self.edges])
+        hi = np.concatenate([self.edges, [1.0]])
+        rows = []
+        for g, (s, c) in enumerate(zip(self.starts, self.counts)):
+            sl = slice(s, s + c)
+            rf, bf = self.runs_for[sl], self.balls_for[sl]
+            ra, ba = self.runs_against[sl], self.balls_against[sl]
+            rows.append({
+                "winner_p": f"{lo[g]:.2f}-{hi[g]:.2f}",
+                "matches": int(c),
+                "winner_runs": rf.mean(),
+                "loser_runs": ra.mean(),
+                "winner_overs": bf.mean() / 6,
+                "nrr_swing": np.mean(6 * (rf / bf - ra / ba)),
+            })
+        return pd.DataFrame(rows)
+
+
+def _merge_small_groups(p: np.ndarray, edges: Sequence[float],
+                        min_group: int) -> np.ndarray:
+    edges = list(edges)
+    while edges:
+        counts = np.bincount(np.searchsorted(edges, p, side="right"),
+                             minlength=len(edges) + 1)
+        small = np.flatnonzero(counts < min_group)
+        if not len(small):
+            break
+        # Merge with the next group up (the top group with the one below).
+        edges.pop(min(int(small[0]), len(edges) - 1))
+    return np.array(edges, dtype=float)
+
+
+def fit_score_model(innings_csv: str = INNINGS_CSV,
+                    elo_csv: str = ELO_CSV,
+                    edges: Sequence[float] = STRENGTH_EDGES,
+                    min_group: int = MIN_GROUP) -> ScoreModel:
+    inn = pd.read_csv(innings_csv, dtype={"match_id": str})
+    elo = pd.read_csv(elo_csv, dtype={"match_id": str},
+                      usecols=["match_id", "team_1", "elo_team_1",
+                               "elo_team_2"]).rename(
+                                   columns={"team_1": "elo_side_1"})
+    df = inn.merge(elo, on="match_id")
+    if df.empty:
+        raise ValueError(f"No innings in {innings_csv} match {elo_csv}")
+
+    first_won = (df["winner"] == df["team_1"]).to_numpy()
+    side_1_won = (df["winner"] == df["elo_side_1"]).to_numpy()
+    elo_w = np.where(side_1_won, df["elo_team_1"], df["elo_team_2"])
+    elo_l = np.where(side_1_won, df["elo_team_2"], df["elo_team_1"])
+    p_winner = 1.0 / (1.0 + 10**((elo_l - elo_w) / 400.0))
+
+    # NRR overs: all out = the full quota; a few scorecards log 121 balls.
+    balls_1 = np.where(df["wickets_1"] >= 10, FULL_BALLS,
+                       np.minimum(df["balls_1"], FULL_BALLS))
+    balls_2 = np.where(df["wickets_2"] >= 10, FULL_BALLS,
+                       np.minimum(df["balls_2"], FULL_BALLS))
+    runs_1 = df["runs_1"].to_numpy(dtype=float)
+    runs_2 = df["runs_2"].to_numpy(dtype=float)
+    keep = (balls_1 > 0) & (balls_2 > 0)
+
+    edges = _merge_small_groups(p_winner[keep], edges, min_group)
+    group = np.searchsorted(edges, p_winner[keep], side="right")
+    order = np.argsort(group, kind="stable")
+    counts = np.bincount(group, minlength=len(edges) + 1)
+
+    def pick(first, second):
+        return np.where(first_won, first, second)[keep][order].astype(float)
+
+    return ScoreModel(
+        edges=edges,
+        starts=np.concatenate([[0], np.cumsum(counts)[:-1]]),
+        counts=counts,
+        runs_for=pick(runs_1, runs_2),
+        balls_for=pick(balls_1, balls_2),
+        runs_against=pick(runs_2, runs_1),
+        balls_against=pick(balls_2, balls_1),
+    )
+
+
+_CACHE: dict = {}
+
+
+def load_score_model(innings_csv: str = INNINGS_CSV,
+                     elo_csv: str = ELO_CSV) -> ScoreModel:
+    """`fit_score_model`, refitted only when the tables change."""
+    key = tuple((p, os.stat(p).st_mtime_ns) for p in (innings_csv, elo_csv))
+    if key not in _CACHE:
+        _CACHE.clear()
+        _CACHE[key] = fit_score_model(innings_csv, elo_csv)
+    return _CACHE[key]
+
+
+def net_run_rate(scored: np.ndarray, faced: np.ndarray, conceded: np.ndarray,
+                 bowled: np.ndarray) -> np.ndarray:
+    """Runs per over scored minus conceded; 0 for a side yet to play."""
+    for_rate = np.divide(scored, faced, out=np.zeros_like(scored),
+                         where=faced > 0)
+    against_rate = np.divide(conceded, bowled, out=np.zeros_like(conceded),
+                             where=bowled > 0)
+    return 6.0 * (for_rate - against_rate)
+
+
+def main():
+    model = load_score_model()
+    pd.set_option("display.width", 120)
+    print(f"{int(model.counts.sum())} results from {INNINGS_CSV}")
+    print(model.summary().round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
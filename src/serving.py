@@ -0,0 +1,362 @@
+"""
+Versioned model + data artifacts and zero-downtime reloads.
+
+A published version is an immutable directory
+
+    artifacts/versions/<id>/
+        model.pkl
+        matches_t20i_men.csv
+        meta.json           content hashes, creation time, training meta
+
+and artifacts/CURRENT holds the id to serve. Publishing copies the build
+outputs into a new directory and then flips CURRENT with an atomic rename,
+so a server never sees half-written files. Without a CURRENT file the build
+outputs (artifacts/model.pkl, data/matches_t20i_men.csv) are served as-is.
+
+Everything derived from a version (model, match history and Elo cache, live
+state, probability cache, snapshot store) hangs off one ServingVersion. A
+reload builds the new one in a background thread while requests keep using
+the old one, replays results ingested in the meantime and swaps it in
+(src/runtime.py); requests already running finish on the version they
+started with. Team IDs are append-only across versions, so they stay valid.
+
+Usage:
+    python -m src.serving publish          # after training / rebuilding data
+    python -m src.serving list
+    python -m src.serving activate <id>    # roll back / forward
+
+A running API picks the change up through POST /admin/reload (localhost
+only, or any client sending the ADMIN_TOKEN value as X-Admin-Token), or on
+its own when MODEL_RELOAD_POLL (seconds) is set.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from src.live_elo import MatchHistory
+from src.live_state import LiveState, build_live_state, replay_log
+from src.predict import MODEL_PATH, load_model
+from src.runtime import WRITE_LOCK, activate, active
+from src.snapshot_store import SnapshotStore
+from src.teams import MATCHES_CSV, TEAMS
+
+VERSIONS_DIR = "artifacts/versions"
+CURRENT_PATH = "artifacts/CURRENT"
+TRAIN_META_PATH = "artifacts/meta.json"
+
+# Seconds between checks for a new version; unset or 0 disables the watcher.
+RELOAD_POLL_ENV = "MODEL_RELOAD_POLL"
+
+# Served when no version has been published yet.
+BUILD_VERSION = "build"
+
+
+def _sha(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class ServingVersion:
+    name: str
+    model_path: str
+    matches_path: str
+    model_version: str
+    data_version: str
+    model: object
+    matches: MatchHistory
+    live: LiveState
+    snapshots: SnapshotStore
+    # (as_of day, team_a id, team_b id) -> blended probability (prob_cache)
+    prob_cache: dict = field(default_factory=dict)
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat(
+        timespec="seconds"))
+
+    def describe(self) -> dict:
+        """What API responses report as the version that served them."""
+        return {
+            "version": self.name,
+            "model": self.model_version,
+            "data": self.data_version,
+            "ingested": self.matches.n_ingested,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def read_current() -> Optional[str]:
+    if not os.path.exists(CURRENT_PATH):
+        return None
+    with open(CURRENT_PATH, "r") as f:
+        return f.read().strip() or None
+
+
+def resolve(name: Optional[str] = None) -> tuple[str, str, str]:
+    """
+    (name, model path, matches path) of version `name`, else of the one
+    CURRENT names, else of the build outputs. Raises ValueError for an
+    unknown version.
+    """
+    name = name or read_current()
+    if name is None or name == BUILD_VERSION:
+        return BUILD_VERSION, MODEL_PATH, MATCHES_CSV
+    # Only ids of published versions: the name ends up in a path whose
+    # model file gets unpickled.
+    if (os.sep in name or "/" in name or ".." in name
+            or name not in {m["version"] for m in list_versions()}):
+        raise ValueError(f"Unknown version {name!r}")
+    path = os.path.join(VERSIONS_DIR, name)
+    return name, os.path.join(path, "model.pkl"), os.path.join(
+        path, os.path.basename(MATCHES_CSV))
+
+
+def load_version(name: Optional[str] = None) -> ServingVersion:
+    """Build everything needed to serve version `name` (see `resolve`)."""
+    name, model_path, matches_path = resolve(name)
+    model = load_model(model_path)
+    frame = pd.read_csv(matches_path, parse_dates=["date"])
+    # Registered ahead of the swap. Versions still serving requests don't
+    # cover the new IDs, and their live state reports them as unknown
+    # teams (LiveState.knows) rather than indexing past its arrays.
+    with WRITE_LOCK:
+        for team in pd.concat([frame["team_1"], frame["team_2"]]).dropna():
+            TEAMS.add(str(team))
+    matches = MatchHistory(frame)
+    return ServingVersion(
+        name=name,
+        model_path=model_path,
+        matches_path=matches_path,
+        model_version=_sha(model_path)[:12],
+        data_version=_sha(matches_path)[:12],
+        model=model,
+        matches=matches,
+        live=build_live_state(matches),
+        snapshots=SnapshotStore(model_path=model_path,
+                                matches_path=matches_path),
+    )
+
+
+def set_current(name: str) -> None:
+    resolve(name)
+    tmp = f"{CURRENT_PATH}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(name + "\n")
+    os.replace(tmp, CURRENT_PATH)
+
+
+def list_versions() -> list[dict]:
+    out = []
+    for name in sorted(os.listdir(VERSIONS_DIR)) if os.path.isdir(
+            VERSIONS_DIR) else []:
+        meta = os.path.join(VERSIONS_DIR, name, "meta.json")
+        if os.path.exists(meta):
+            with open(meta, "r") as f:
+                meta = json.load(f)
+            # Skips half-published ".tmp-" directories.
+            if meta.get("version") == name:
+                out.append(meta)
+    return out
+
+
+def publish(model_path: str = MODEL_PATH, matches_path: str = MATCHES_CSV,
+            make_current: bool = True) -> str:
+    """
+    Copy the build outputs into a new version directory (reusing the
+    current version when nothing changed) and point CURRENT at it.
+    """
+    model_sha = _sha(model_path)
+    data_sha = _sha(matches_path)
+
+    for meta in list_versions():
+        if (meta["model_sha256"], meta["matches_sha256"]) == (model_sha,
+                                                              data_sha):
+            if make_current:
+                set_current(meta["version"])
+            return meta["version"]
+
+    name = (f"{datetime.now():%Y%m%d-%H%M%S}"
+            f"-m{model_sha[:6]}-d{data_sha[:6]}")
+    path = os.path.join(VERSIONS_DIR, name)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp)
+    shutil.copy2(model_path, os.path.join(tmp, "model.pkl"))
+    shutil.copy2(matches_path,
+                 os.path.join(tmp, os.path.basename(MATCHES_CSV)))
+    train_meta = None
+    if os.path.exists(TRAIN_META_PATH):
+        with open(TRAIN_META_PATH, "r") as f:
+            train_meta = json.load(f)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "version": name,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "model_sha256": model_sha,
+                "matches_sha256": data_sha,
+                "train": train_meta,
+            },
+            f,
+            indent=2)
+    os.replace(tmp, path)
+
+    if make_current:
+        set_current(name)
+    return name
+
+
+# Background reloads: at most one runs at a time.
+_reload_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+_reload_status: dict = {"status": "idle"}
+
+
+def reload_status() -> dict:
+    return dict(_reload_status)
+
+
+def _reload(name: Optional[str]) -> None:
+    t0 = time.perf_counter()
+    try:
+        version = load_version(name)
+        with WRITE_LOCK:
+            # Results ingested while the new version was being built.
+            replay_log(version.matches, version.live)
+            previous = active()
+            activate(version)
+    except Exception as e:  # keep serving the old version
+        _reload_status.update(status="failed",
+                              error=f"{type(e).__name__}: {e}",
+                              finished=datetime.now().isoformat(
+                                  timespec="seconds"))
+        print(f"serving: reload failed, still serving the old version: {e}")
+        return
+    seconds = time.perf_counter() - t0
+    _reload_status.update(status="done",
+                          serving=version.describe(),
+                          previous=previous.name,
+                          seconds=round(seconds, 3),
+                          finished=datetime.now().isoformat(timespec="seconds"))
+    print(f"serving: now serving {version.name} (was {previous.name}), "
+          f"built in {seconds:.1f}s")
+
+
+def reload(name: Optional[str] = None, wait: bool = False) -> dict:
+    """
+    Build version `name` (default: what CURRENT names) in the background
+    and swap it in when ready. If a reload is already running, that one is
+    left to finish instead. Returns the reload status, after the reload
+    finished when `wait` is set. Raises ValueError for an unknown version.
+    """
+    global _reload_thread
+    resolve(name)
+    with _reload_lock:
+        if _reload_thread is None or not _reload_thread.is_alive():
+            _reload_status.clear()
+            _reload_status.update(status="loading",
+                                  target=name or read_current()
+                                  or BUILD_VERSION,
+                                  started=datetime.now().isoformat(
+                                      timespec="seconds"))
+            _reload_thread = threading.Thread(target=_reload,
+                                              args=(name, ),
+                                              name="serving-reload",
+                                              daemon=True)
+            _reload_thread.start()
+        thread = _reload_thread
+    if wait:
+        thread.join()
+    return reload_status()
+
+
+def _stat(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _watch_stamp() -> tuple:
+    name = read_current()
+    if name is not None:
+        return (name, )
+    # Nothing published: follow the build outputs themselves.
+    return (_stat(MODEL_PATH), _stat(MATCHES_CSV))
+
+
+def watch(interval: float,
+          stop: Optional[threading.Event] = None) -> threading.Thread:
+    """
+    Reload whenever CURRENT (or, before anything is published, the build
+    outputs) changes; checked every `interval` seconds until `stop` is set.
+    A change that can't be loaded is reported in `reload_status` and the
+    watcher keeps polling.
+    """
+    stop = stop or threading.Event()
+
+    def loop() -> None:
+        seen = _watch_stamp()
+        while not stop.wait(interval):
+            stamp = _watch_stamp()
+            if stamp != seen:
+                seen = stamp
+                try:
+                    reload(wait=True)
+                except Exception as e:  # e.g. CURRENT names a removed version
+                    with _reload_lock:
+                        _reload_status.clear()
+                        _reload_status.update(
+                            status="failed",
+                            target=read_current() or BUILD_VERSION,
+                            error=f"{type(e).__name__}: {e}",
+                            finished=datetime.now().isoformat(
+                                timespec="seconds"))
+                    print(f"serving: watcher could not reload, still "
+                          f"serving the old version: {e}")
+
+    thread = threading.Thread(target=loop, name="serving-watch", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish and switch served model/data versions.")
+    parser.add_argument("command", choices=["publish", "list", "activate"])
+    parser.add_argument("version", nargs="?",
+                        help="version id (for activate)")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        print(f"published {publish()}; running servers pick it up on "
+              "POST /admin/reload (or with MODEL_RELOAD_POLL set)")
+    elif args.command == "list":
+        current = read_current()
+        for meta in list_versions():
+            mark = "*" if meta["version"] == current else " "
+            print(f"{mark} {meta['version']}  created {meta['created']}")
+    else:
+        if not args.version:
+            parser.error("activate needs a version id")
+        try:
+            set_current(args.version)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"serving {args.version}")
+
+
+if __name__ == "__main__":
+    main()
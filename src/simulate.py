@@ -1,63 +1,343 @@
-import random
 from datetime import datetime
 from itertools import combinations
-from src.prob_cache import build_prob_cache
-from src.live_features import build_live_features
 
+import numpy as np
 
-def margin_bonus(p_winner: float) -> float:
+from src.prob_cache import build_prob_matrix
+from src.live_features import build_live_features
+from src.ranking import DEFAULT_TIEBREAKERS, rank_tables, validate_tiebreakers
+from src.sampling import Sampler, make_sampler, validate_sampling
+from src.score_model import (ScoreModel, load_score_model, net_run_rate,
+                             validate_nrr)
+from src.tournament import (KnockoutStep, RoundRobinStep, TournamentPlan,
+                            compile_format)
+from src.teams import TEAMS
+
+# Simulations are run in batches of this size to bound memory.
+SIM_CHUNK = 20000
+# Sobol batches are powers of two to keep the sequence balanced.
+SOBOL_CHUNK = 16384
+
+
+def margin_bonus(p_winner: np.ndarray, rng: np.random.Generator,
+                 u: np.ndarray | None = None) -> np.ndarray:
     """
     Proxy for net run rate margin.
     Higher mismatch -> bigger expected margin.
+    `u` optionally supplies the uniforms behind the noise.
     """
-    strength = abs(p_winner - 0.5) * 2.0  # 0..1
+    strength = np.abs(p_winner - 0.5) * 2.0  # 0..1
     base = 0.08
     scale = 0.25
-    noise = random.uniform(-0.03, 0.03)
-    return max(0.02, base + scale * strength + noise)
-
-
-def rank_table(points: dict, nrr: dict):
-    return sorted(points.keys(),
-                  key=lambda t: (points[t], nrr[t]),
-                  reverse=True)
+    if u is None:
+        noise = rng.uniform(-0.03, 0.03, size=np.shape(p_winner))
+    else:
+        noise = -0.03 + 0.06 * u
+    return np.maximum(0.02, base + scale * strength + noise)
 
 
 def fixtures_round_robin(teams):
     return list(combinations(teams, 2))
 
 
-def simulate_match_cached(a, b, prob_cache):
-    p_a = prob_cache[(a, b)]
-    return a if random.random() < p_a else b
-
-
-def rank_by_points(points: dict):
-    ranked = sorted(points.items(), key=lambda x: x[1], reverse=True)
-    return [t for t, _ in ranked]
-
-
-def simulate_tournament(config: dict, n_sims: int = 10000):
-    groups = config["groups"]
-    super8_cfg = config["super8"]
-
-    # Build full team list
-    all_teams = sorted({t for g in groups.values() for t in g})
+def simulate_match_cached(a: np.ndarray, b: np.ndarray, probs: np.ndarray,
+                          rng: np.random.Generator) -> np.ndarray:
+    """Winner of a vs b in every simulation of the batch."""
+    p_a = probs[a, b]
+    return np.where(rng.random(len(a)) < p_a, a, b)
 
-    # Counts
-    win_counts = {t: 0 for t in all_teams}
-    final_counts = {t: 0 for t in all_teams}
-    semi_counts = {t: 0 for t in all_teams}
-    super8_counts = {
-        t: 0
-        for t in all_teams
-    }  # advanced from group stage into Super 8
 
-    # Use a fixed "as-of" date for features
-    as_of_date = datetime(2026, 2, 7)
+def play_round_robin(teams: np.ndarray,
+                     probs: np.ndarray,
+                     rng: np.random.Generator,
+                     rules: dict,
+                     fixtures=None,
+                     sampler: Sampler | None = None,
+                     scores: ScoreModel | None = None) -> np.ndarray:
+    """
+    Play a round-robin group for a batch of simulations.
+
+    teams: (n_sims, n_teams) team indices, one row per simulation.
+    fixtures: (i, j) column pairs to play; every pair once by default.
+    sampler: source of the result/margin/washout draws (independent
+             draws from `rng` by default).
+    scores: draw both innings of every result from this model and rank by
+            real net run rate, instead of the `margin_bonus` proxy.
+    Returns the same teams in finishing order.
+    """
+    n, g = teams.shape
+    if sampler is None:
+        sampler = Sampler(rng)
+        sampler.start(n)
+    points_win = rules.get("points_win", 2)
+    points_nr = rules.get("points_no_result", 1)
+    no_result_rate = rules.get("no_result_rate", 0.0)
+
+    points = np.zeros((n, g))
+    wins = np.zeros((n, g), dtype=np.int16)
+    nrr = np.zeros((n, g))
+    h2h = np.zeros((n, g, g), dtype=np.int8)
+    if scores is not None:
+        runs_for = np.zeros((n, g))
+        balls_for = np.zeros((n, g))
+        runs_against = np.zeros((n, g))
+        balls_against = np.zeros((n, g))
+
+    if fixtures is None:
+        fixtures = fixtures_round_robin(range(g))
+
+    for i, j in fixtures:
+        a = teams[:, i]
+        b = teams[:, j]
+        p_a = probs[a, b]
+        a_won = sampler.uniform()[:, 0] < p_a
+
+        p_won = np.where(a_won, p_a, 1 - p_a)
+        u = sampler.uniform()[:, 0]
+        if scores is None:
+            # NRR proxy update
+            m = margin_bonus(p_won, rng, u)
+            swing = np.where(a_won, m, -m)
+        else:
+            w_runs, w_balls, l_runs, l_balls = scores.sample(p_won, u)
+
+        if no_result_rate > 0:
+            played = sampler.uniform()[:, 0] >= no_result_rate
+            points[~played, i] += points_nr
+            points[~played, j] += points_nr
+            if scores is None:
+                swing = np.where(played, swing, 0.0)
+            else:
+                w_runs, w_balls, l_runs, l_balls = (
+                    x * played for x in (w_runs, w_balls, l_runs, l_balls))
+        else:
+            played = np.ones(n, dtype=bool)
+
+        a_win = played & a_won
+        b_win = played & ~a_won
+        points[:, i] += points_win * a_win
+        points[:, j] += points_win * b_win
+        wins[:, i] += a_win
+        wins[:, j] += b_win
+        h2h[:, i, j] += a_win
+        h2h[:, j, i] += b_win
+        if scores is None:
+            nrr[:, i] += swing
+            nrr[:, j] -= swing
+        else:
+            a_runs = np.where(a_won, w_runs, l_runs)
+            a_balls = np.where(a_won, w_balls, l_balls)
+            b_runs = w_runs + l_runs - a_runs
+            b_balls = w_balls + l_balls - a_balls
+            runs_for[:, i] += a_runs
+            balls_for[:, i] += a_balls
+            runs_against[:, i] += b_runs
+            balls_against[:, i] += b_balls
+            runs_for[:, j] += b_runs
+            balls_for[:, j] += b_balls
+            runs_against[:, j] += a_runs
+            balls_against[:, j] += a_balls
+
+    if scores is not None:
+        nrr = net_run_rate(runs_for, balls_for, runs_against, balls_against)
+
+    tiebreakers = rules.get("tiebreakers", DEFAULT_TIEBREAKERS)
+    positions = rank_tables(points, wins, nrr, h2h, tiebreakers, rng)
+    return np.take_along_axis(teams, np.argsort(positions, axis=1), axis=1)
+
+
+def run_plan(plan: TournamentPlan,
+             probs: np.ndarray,
+             rng: np.random.Generator,
+             n: int,
+             sampler: Sampler | None = None,
+             scores: ScoreModel | None = None) -> np.ndarray:
+    """
+    Simulate `n` tournaments. Returns the slot table, shape (n, n_slots):
+    which team (index into plan.teams) ended up in every slot.
+    `scores` switches group tables to real NRR (see play_round_robin).
+    """
+    if sampler is None:
+        sampler = Sampler(rng)
+    sampler.start(n)
+
+    slots = np.empty((n, plan.n_slots), dtype=np.int64)
+    slots[:, plan.seed_slots] = plan.seed_teams
+
+    for step in plan.steps:
+        if isinstance(step, RoundRobinStep):
+            slots[:, step.outputs] = play_round_robin(slots[:, step.inputs],
+                                                      probs, rng, step.rules,
+                                                      step.fixtures, sampler,
+                                                      scores)
+        else:
+            a = slots[:, step.inputs[:, 0]]
+            b = slots[:, step.inputs[:, 1]]
+            u = sampler.uniform(len(step.winners))
+            w = np.where(u < probs[a, b], a, b)
+            slots[:, step.winners] = w
+            slots[:, step.losers] = a + b - w
+
+    return slots
+
+
+def _knockout_sources(plan: TournamentPlan) -> dict:
+    """slot -> (stage, side-a slot, side-b slot, is_winner) for match results."""
+    sources = {}
+    for step in plan.steps:
+        if isinstance(step, KnockoutStep):
+            for k, (a, b) in enumerate(step.inputs):
+                sources[int(step.winners[k])] = (step.stage, a, b, True)
+                sources[int(step.losers[k])] = (step.stage, a, b, False)
+    return sources
+
+
+def _produced_by_stage(plan: TournamentPlan, stage: int) -> set:
+    out = set()
+    for step in plan.steps:
+        if step.stage != stage:
+            continue
+        if isinstance(step, RoundRobinStep):
+            out.update(int(s) for s in step.outputs)
+        else:
+            out.update(int(s) for s in step.winners)
+            out.update(int(s) for s in step.losers)
+    return out
+
+
+def tally(plan: TournamentPlan,
+          probs: np.ndarray,
+          slots: np.ndarray,
+          rao_blackwell: bool = False):
+    """
+    Per-stage participation and title counts for one batch of slot tables:
+    (reached (n_stages, n_teams), wins (n_teams,)).
 
-    # Precompute match probabilities once
-    prob_cache = build_prob_cache(all_teams, as_of_date)
+    With `rao_blackwell`, a place decided by a knockout match counts as the
+    probability of winning (or losing) that match given who played it,
+    instead of its sampled 0/1 outcome. Same expectation, less variance.
+    """
+    n = len(slots)
+    n_teams = len(plan.teams)
+    rows = np.arange(n)[:, None]
+    sources = _knockout_sources(plan) if rao_blackwell else {}
+
+    def expected_fill(slot_list, weights):
+        # Chance each team fills `slot_list`, given the match's two sides.
+        for slot in slot_list:
+            stage, a_slot, b_slot, is_winner = sources[slot]
+            a = slots[:, a_slot]
+            b = slots[:, b_slot]
+            p_a = probs[a, b] if is_winner else 1.0 - probs[a, b]
+            weights[rows[:, 0], a] += p_a
+            weights[rows[:, 0], b] += 1.0 - p_a
+
+    reached = np.zeros((len(plan.stage_names), n_teams))
+    for s_i, entering in enumerate(plan.stage_slots):
+        # Slots filled within the stage (e.g. the qualifier loser playing Q2)
+        # hold teams that already entered it.
+        own = _produced_by_stage(plan, s_i)
+        outside = [int(x) for x in entering if int(x) not in own]
+        rb = [x for x in outside if x in sources]
+        direct = [x for x in outside if x not in sources]
+
+        took_part = np.zeros((n, n_teams))
+        if direct:
+            hit = np.zeros((n, n_teams), dtype=bool)
+            hit[rows, slots[:, direct]] = True
+            took_part += hit
+        expected_fill(rb, took_part)
+        reached[s_i] = took_part.sum(axis=0)
+
+    if plan.champion_slot in sources:
+        champ = np.zeros((n, n_teams))
+        expected_fill([plan.champion_slot], champ)
+        wins = champ.sum(axis=0)
+    else:
+        wins = np.bincount(slots[:, plan.champion_slot],
+                           minlength=n_teams).astype(float)
+    return reached, wins
+
+
+def run_counts(plan: TournamentPlan,
+               probs: np.ndarray,
+               n_sims: int,
+               rng: np.random.Generator,
+               sampling: str = "plain",
+               rao_blackwell: bool = False,
+               trace=None,
+               scores: ScoreModel | None = None):
+    """`tally` summed over `n_sims` simulations, run in batches."""
+    sampler = make_sampler(
+        sampling, rng, lambda smp: run_plan(
+            plan, probs, np.random.default_rng(0), 2, smp, scores))
+    chunk = SOBOL_CHUNK if sampling == "sobol" else SIM_CHUNK
+
+    reached = np.zeros((len(plan.stage_names), len(plan.teams)))
+    wins = np.zeros(len(plan.teams))
+
+    if trace is not None:
+        trace.begin(plan)
+
+    for start in range(0, n_sims, chunk):
+        n = min(chunk, n_sims - start)
+        slots = run_plan(plan, probs, rng, n, sampler, scores)
+
+        batch_reached, batch_wins = tally(plan, probs, slots, rao_blackwell)
+        reached += batch_reached
+        wins += batch_wins
+        if trace is not None:
+            trace.write(slots)
+
+    return reached, wins
+
+
+def ranks_on_nrr(plan: TournamentPlan) -> bool:
+    """Whether any round-robin stage of `plan` has "nrr" in its tiebreakers."""
+    return any(
+        "nrr" in validate_tiebreakers(
+            step.rules.get("tiebreakers", DEFAULT_TIEBREAKERS))
+        for step in plan.steps if isinstance(step, RoundRobinStep))
+
+
+def simulate_tournament(config: dict,
+                        n_sims: int = 10000,
+                        seed=None,
+                        trace=None,
+                        sampling: str = "plain",
+                        rao_blackwell: bool = False,
+                        nrr: str = "proxy"):
+    """
+    Simulate `n_sims` tournaments and return per-team stage percentages.
+
+    `trace` (a src.traces.TraceWriter) additionally receives every batch of
+    slot tables; the caller closes it to get the trace summary.
+    `sampling` picks the source of random draws (see src/sampling.py) and
+    `rao_blackwell` scores knockout-decided places by their conditional
+    probability; both only reduce the noise of the percentages.
+    `nrr="scores"` ranks group tables by real net run rate from sampled
+    innings scores (src/score_model.py) instead of the margin proxy. It is
+    ignored, with a message, when no table is ranked on nrr.
+    """
+    plan = compile_format(config)
+    validate_sampling(sampling)
+    if validate_nrr(nrr) == "scores" and not ranks_on_nrr(plan):
+        print(f"simulate: no stage of {plan.name} ranks on nrr, "
+              "ignoring nrr=\"scores\"")
+        nrr = "proxy"
+    scores = load_score_model() if nrr == "scores" else None
+    rng = np.random.default_rng(seed)
+
+    # Inside the simulation teams are positions in plan.teams; names are
+    # only used for the results.
+    all_teams = plan.teams
+    index = {t: i for i, t in enumerate(all_teams)}
+
+    # Features are taken as of the format's "as_of" date
+    as_of_date = datetime.fromisoformat(plan.as_of)
+
+    # Precompute match probabilities once (fails fast on unknown teams)
+    prob_cache = build_prob_matrix(TEAMS.ids(all_teams), as_of_date)
 
     print("DEBUG ELO + probs:")
     pairs = [
@@ -68,13 +348,15 @@ def simulate_tournament(config: dict, n_sims: int = 10000):
     ]
 
     for a, b in pairs:
+        if a not in index or b not in index:
+            continue
         feats = build_live_features(a, b, as_of_date)
         print(
             a,
             "vs",
             b,
             "| p =",
-            round(prob_cache[(a, b)], 4),
+            round(prob_cache[index[a], index[b]], 4),
             "| elo_a =",
             round(float(feats["elo_a"]), 1),
             "| elo_b =",
@@ -88,111 +370,19 @@ def simulate_tournament(config: dict, n_sims: int = 10000):
         )
     print("---")
 
-    for _ in range(n_sims):
-        # -----------------------------
-        # Group stage
-        # -----------------------------
-        group_positions = {}  # A -> [1st, 2nd, 3rd, 4th, 5th]
-
-        for group_name, teams in groups.items():
-            points = {t: 0 for t in teams}
-            nrr = {t: 0.0 for t in teams}
-
-            for a, b in fixtures_round_robin(teams):
-                p_a = prob_cache[(a, b)]
-                winner = simulate_match_cached(a, b, prob_cache)
-                points[winner] += 2
-
-                # NRR proxy update
-                if winner == a:
-                    m = margin_bonus(p_a)
-                    nrr[a] += m
-                    nrr[b] -= m
-                else:
-                    m = margin_bonus(1 - p_a)
-                    nrr[b] += m
-                    nrr[a] -= m
-
-            group_positions[group_name] = rank_table(points, nrr)
-
-        # Mark Super 8 qualifiers (top 2 from each group)
-        qualifiers = []
-        for g, ordered in group_positions.items():
-            qualifiers.extend(ordered[:2])
-
-        for t in qualifiers:
-            super8_counts[t] += 1
-
-        # Helper to resolve "A1", "B2" into real team
-        def resolve_group_slot(slot: str) -> str:
-            g = slot[0]
-            pos = int(slot[1]) - 1
-            return group_positions[g][pos]
-
-        # -----------------------------
-        # Super 8 stage
-        # -----------------------------
-        super8_positions = {}  # S1 -> [1st..4th]
-
-        for s_group, slots in super8_cfg["groups"].items():
-            s_teams = [resolve_group_slot(s) for s in slots]
-            s_points = {t: 0 for t in s_teams}
-            s_nrr = {t: 0.0 for t in s_teams}
-
-            for a, b in fixtures_round_robin(s_teams):
-                p_a = prob_cache[(a, b)]
-                winner = simulate_match_cached(a, b, prob_cache)
-                s_points[winner] += 2
-
-                # NRR proxy update (same logic as group stage)
-                if winner == a:
-                    m = margin_bonus(p_a)
-                    s_nrr[a] += m
-                    s_nrr[b] -= m
-                else:
-                    m = margin_bonus(1 - p_a)
-                    s_nrr[b] += m
-                    s_nrr[a] -= m
-
-            super8_positions[s_group] = rank_table(s_points, s_nrr)
-
-        # Resolve "S1_1" means 1st team in Super 8 group S1
-        def resolve_super8_slot(slot: str) -> str:
-            s_group, pos = slot.split("_")
-            pos_i = int(pos) - 1
-            return super8_positions[s_group][pos_i]
-
-        # -----------------------------
-        # Knockouts
-        # -----------------------------
-        sf_pairs = []
-        for sf in config["knockout"]["semi_finals"]:
-            sf_pairs.append(
-                (resolve_super8_slot(sf[0]), resolve_super8_slot(sf[1])))
-
-        sf_winners = []
-        for a, b in sf_pairs:
-            semi_counts[a] += 1
-            semi_counts[b] += 1
-            sf_winners.append(simulate_match_cached(a, b, prob_cache))
-
-        final_a, final_b = sf_winners[0], sf_winners[1]
-        final_counts[final_a] += 1
-        final_counts[final_b] += 1
-
-        champ = simulate_match_cached(final_a, final_b, prob_cache)
-        win_counts[champ] += 1
-
-    # Build results
+    # reached[s] = how often each team took part in stage s
+    reached, win_counts = run_counts(plan, prob_cache, n_sims, rng, sampling,
+                                     rao_blackwell, trace, scores)
+
+    # Build results. Every stage after the first gets a "<stage>_pct"
+    # (super8_pct, semi_pct, final_pct for the World Cup layout).
     results = []
-    for t in all_teams:
-        results.append({
-            "team": t,
-            "win_pct": win_counts[t] / n_sims * 100,
-            "final_pct": final_counts[t] / n_sims * 100,
-            "semi_pct": semi_counts[t] / n_sims * 100,
-            "super8_pct": super8_counts[t] / n_sims * 100
-        })
+    for t, name in enumerate(all_teams):
+        row = {"team": name, "win_pct": float(win_counts[t] / n_sims * 100)}
+        for s_i in range(len(plan.stage_names) - 1, 0, -1):
+            row[f"{plan.stage_names[s_i]}_pct"] = float(reached[s_i, t] /
+                                                        n_sims * 100)
+        results.append(row)
 
     results.sort(key=lambda x: x["win_pct"], reverse=True)
     return results
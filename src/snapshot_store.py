@@ -0,0 +1,161 @@
+"""
+Precomputed all-pairs predictions for fixed as-of dates.
+
+A snapshot for day D lives in artifacts/snapshots/<D>/:
+
+    meta.json       teams (row/column order), feature names, fingerprint
+    features.npy    (n, n, n_features) live features for team i vs team j
+    predict.npy     (n, n) /predict probability that team i beats team j
+    simulate.npy    (n, n) simulator (prob_cache) probability
+
+The arrays are memory-mapped, so a lookup is two dict hits and an index.
+Snapshots are built by `python -m src.build_snapshots`.
+
+A snapshot is only used while its fingerprint still matches: the model
+artifact, the matches table, the feature/probability code and the ingested
+results dated before D. The files are stat-checked on every lookup; when
+any of them changes the loaded snapshots are dropped and re-verified.
+The store for the served version is `current().snapshots` (src/runtime.py).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.live_state import LOG_PATH, read_log
+from src.teams import MATCHES_CSV, TEAMS, UnknownTeamError
+
+SNAPSHOT_DIR = "artifacts/snapshots"
+MODEL_PATH = "artifacts/model.pkl"
+
+# Source that determines the snapshot contents.
+SNAPSHOT_CODE = [
+    "src/live_features.py",
+    "src/live_elo.py",
+    "src/live_state.py",
+    "src/predict.py",
+    "src/prob_cache.py",
+    "src/teams.py",
+]
+
+
+def _day(as_of) -> str:
+    return as_of.date().isoformat() if isinstance(as_of, datetime) else str(
+        as_of)[:10]
+
+
+def fingerprint(day: str, model_path: str = MODEL_PATH,
+                matches_path: str = MATCHES_CSV) -> str:
+    h = hashlib.sha256()
+    # Model and matches table by content only, so a versioned copy of the
+    # same files (src/serving.py) keeps matching.
+    for label, path in [("model", model_path), ("matches", matches_path)
+                        ] + [(p, p) for p in SNAPSHOT_CODE]:
+        h.update(label.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    # Results ingested at runtime only matter if they precede the snapshot.
+    for row in read_log():
+        if str(row["date"]) < day:
+            h.update(json.dumps(row, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class Snapshot:
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.day: str = self.meta["as_of"]
+        self.teams = self.meta["teams"]
+        self.feature_names = self.meta["features"]
+        self.features = np.load(os.path.join(path, "features.npy"),
+                                mmap_mode="r")
+        self.predict = np.load(os.path.join(path, "predict.npy"), mmap_mode="r")
+        self.simulate = np.load(os.path.join(path, "simulate.npy"),
+                                mmap_mode="r")
+        # team ID -> row; -1 for teams the snapshot doesn't cover
+        self.row = np.full(len(TEAMS), -1, dtype=np.int64)
+        for i, name in enumerate(self.teams):
+            try:
+                self.row[TEAMS.id(name)] = i
+            except UnknownTeamError:
+                pass
+
+    def rows(self, team_ids) -> np.ndarray:
+        ids = np.asarray(team_ids, dtype=np.int64)
+        out = np.full(len(ids), -1, dtype=np.int64)
+        known = ids < len(self.row)
+        out[known] = self.row[ids[known]]
+        return out
+
+    def pair(self, team_a: int, team_b: int) -> Optional[Tuple[dict, float]]:
+        """(features, /predict probability) or None if either team is absent."""
+        i, j = self.rows([team_a, team_b])
+        if i < 0 or j < 0 or i == j:
+            return None
+        feats = {
+            k: float(v)
+            for k, v in zip(self.feature_names, self.features[i, j])
+        }
+        return feats, float(self.predict[i, j])
+
+
+class SnapshotStore:
+    """
+    Snapshots valid for one model + matches table; every served version
+    (src/serving.py) has its own store over the shared SNAPSHOT_DIR.
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR, model_path: str = MODEL_PATH,
+                 matches_path: str = MATCHES_CSV):
+        self.root = root
+        self.model_path = model_path
+        self.matches_path = matches_path
+        self._loaded: Dict[str, Optional[Snapshot]] = {}
+        self._stamp: tuple = ()
+        self._lock = threading.Lock()
+
+    def _current_stamp(self) -> tuple:
+        stamp = []
+        for path in (self.model_path, self.matches_path, LOG_PATH, self.root):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def get(self, as_of) -> Optional[Snapshot]:
+        """The valid snapshot for `as_of`'s day, or None."""
+        day = _day(as_of)
+        stamp = self._current_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._loaded.clear()
+                self._stamp = stamp
+            if day not in self._loaded:
+                self._loaded[day] = self._load(day)
+            return self._loaded[day]
+
+    def _load(self, day: str) -> Optional[Snapshot]:
+        path = os.path.join(self.root, day)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        snap = Snapshot(path)
+        if snap.meta.get("fingerprint") != fingerprint(
+                day, self.model_path, self.matches_path):
+            print(f"snapshot_store: {path} is stale, ignoring it")
+            return None
+        return snap
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded.clear()
+            self._stamp = ()
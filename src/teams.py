@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+MATCHES_CSV = "data/matches_t20i_men.csv"
+
+FULL_MEMBERS = {
+    "India",
+    "Australia",
+    "England",
+    "Pakistan",
+    "South Africa",
+    "New Zealand",
+    "Sri Lanka",
+    "West Indies",
+    "Afghanistan",
+    "Ireland",
+    "Zimbabwe",
+}
+
+# Short/alternate names people (and tournament configs) use -> the name
+# Cricsheet uses in the matches table.
+ALIASES: Dict[str, str] = {
+    "UAE": "United Arab Emirates",
+    "U.A.E.": "United Arab Emirates",
+    "USA": "United States of America",
+    "U.S.A.": "United States of America",
+    "United States": "United States of America",
+    "PNG": "Papua New Guinea",
+}
+
+
+class UnknownTeamError(ValueError):
+
+    def __init__(self, name: str):
+        super().__init__(f"Unknown team: {name!r}")
+        self.name = name
+
+
+def _key(name: str) -> str:
+    return re.sub(r"\s+", " ", str(name)).strip().casefold()
+
+
+class TeamRegistry:
+    """
+    Dense integer IDs for teams.
+
+    IDs are assigned in sorted order of the canonical names, so they are
+    stable for a given matches table. Lookups are whitespace- and
+    case-insensitive and accept any alias in ALIASES.
+    """
+
+    def __init__(self, names: Iterable[str],
+                 aliases: Dict[str, str] | None = None):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for name in sorted({re.sub(r"\s+", " ", str(n)).strip() for n in names}):
+            self.add(name)
+        for alias, canonical in (ALIASES if aliases is None else aliases).items():
+            if _key(canonical) in self._ids:
+                self._ids.setdefault(_key(alias), self._ids[_key(canonical)])
+
+    @classmethod
+    def from_matches(cls,
+                     matches_csv: str = MATCHES_CSV,
+                     extra: Iterable[str] = ()) -> "TeamRegistry":
+        df = pd.read_csv(matches_csv, usecols=["team_1", "team_2"])
+        names = set(pd.concat([df["team_1"], df["team_2"]]).dropna().unique())
+        return cls(names | set(extra))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return _key(name) in self._ids
+
+    def add(self, name: str) -> int:
+        """Register a team (no-op if already known) and return its ID."""
+        k = _key(name)
+        if k not in self._ids:
+            self._ids[k] = len(self.names)
+            self.names.append(re.sub(r"\s+", " ", str(name)).strip())
+        return self._ids[k]
+
+    def id(self, name: str) -> int:
+        try:
+            return self._ids[_key(name)]
+        except KeyError:
+            raise UnknownTeamError(name) from None
+
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        return np.array([self.id(n) for n in names], dtype=np.int64)
+
+    def name(self, team_id: int) -> str:
+        return self.names[team_id]
+
+    def canonical(self, name: str) -> str:
+        return self.names[self.id(name)]
+
+    def encode(self, values: pd.Series) -> np.ndarray:
+        """Vectorised `id` for a column of team names."""
+        values = values.astype(str)
+        lut = {v: self.id(v) for v in values.unique()}
+        return values.map(lut).to_numpy(dtype=np.int64)
+
+
+# Full members are always known, even if the matches table has no games for
+# them (they then start from the full-member rating).
+TEAMS = TeamRegistry.from_matches(extra=FULL_MEMBERS)
@@ -0,0 +1,284 @@
+"""
+Compile a tournament format into a plan the simulator can run without any
+string handling.
+
+A format is a list of stages:
+
+    {
+      "tournament": "Asia Cup",
+      "as_of": "2025-09-09",
+      "stages": [
+        {"name": "group", "type": "round_robin",
+         "groups": {"A": ["India", "Pakistan", "UAE", "Oman"], ...},
+         "points_win": 2, "tiebreakers": ["points", "nrr"]},
+        {"name": "super4", "type": "round_robin",
+         "groups": {"S": ["A:1", "A:2", "B:1", "B:2"]}},
+        {"name": "final", "type": "knockout",
+         "matches": {"F": ["S:1", "S:2"]}}
+      ],
+      "champion": "W:F"
+    }
+
+Entries are either team names or slot references:
+  - "A:2"   2nd place in round-robin group A (of any earlier stage)
+  - "W:SF1" winner of knockout match SF1
+  - "L:Q1"  loser of knockout match Q1 (eliminator/playoff formats)
+
+so "W" and "L" can't be used as group names.
+
+Round-robin rules (any stage may set them; the legacy layout reads them from
+"group_stage" / "super8"):
+  - "tiebreakers"        ranking chain (src/ranking.py), default points, nrr
+  - "points_win"         points for a win, default 2
+  - "points_no_result"   points for a no-result, default 1
+  - "no_result_rate"     share of matches washed out, default 0; without it
+                         every match has a winner and no-result points
+                         never apply
+
+"eliminator" is accepted as a synonym for "knockout"; matches inside a
+knockout stage may depend on each other. A round robin can set "legs" for
+multiple meetings per pair (a bilateral series is a 2-team round robin with
+legs = number of games). The champion defaults to the winner of the last
+knockout match, or 1st place of the last group if the format ends in a
+round robin.
+
+The original groups/super8/knockout config layout is translated on the fly.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from src.ranking import DEFAULT_TIEBREAKERS, validate_tiebreakers
+
+DEFAULT_AS_OF = "2026-02-07"
+
+RULE_KEYS = ("points_win", "points_no_result", "no_result_rate", "tiebreakers")
+
+
+@dataclass
+class RoundRobinStep:
+    stage: int
+    inputs: np.ndarray  # (g,) slots holding the group's teams
+    outputs: np.ndarray  # (g,) slots for 1st..gth place
+    fixtures: np.ndarray  # (n_games, 2) column pairs within the group
+    rules: dict
+
+
+@dataclass
+class KnockoutStep:
+    stage: int
+    inputs: np.ndarray  # (n_matches, 2) slots of the two sides
+    winners: np.ndarray  # (n_matches,) slots for the winners
+    losers: np.ndarray  # (n_matches,) slots for the losers
+
+
+Step = Union[RoundRobinStep, KnockoutStep]
+
+
+@dataclass
+class TournamentPlan:
+    name: str
+    as_of: str
+    teams: List[str]
+    stage_names: List[str]
+    n_slots: int
+    seed_slots: np.ndarray
+    seed_teams: np.ndarray
+    steps: List[Step] = field(default_factory=list)
+    stage_slots: List[np.ndarray] = field(default_factory=list)
+    champion_slot: int = -1
+    # "A:1", "W:SF1", "L:SF1", "seed:0" ... one per slot, for traces/debugging
+    slot_names: List[str] = field(default_factory=list)
+    groups: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+def legacy_stages(config: dict) -> List[dict]:
+    """groups/super8/knockout layout -> stage list."""
+    group_rules = {
+        k: v
+        for k, v in config.get("group_stage", {}).items() if k in RULE_KEYS
+    }
+    stages = [{
+        "name": "group",
+        "type": "round_robin",
+        "groups": config["groups"],
+        **group_rules,
+    }]
+
+    if "super8" in config:
+        super8 = config["super8"]
+        stages.append({
+            "name": "super8",
+            "type": "round_robin",
+            "groups": {
+                g: [f"{slot[0]}:{slot[1:]}" for slot in slots]
+                for g, slots in super8["groups"].items()
+            },
+            **group_rules,
+            **{k: v for k, v in super8.items() if k in RULE_KEYS},
+        })
+
+    knockout = config.get("knockout", {})
+    if knockout.get("semi_finals"):
+        stages.append({
+            "name": "semi",
+            "type": "knockout",
+            "matches": {
+                f"SF{i + 1}": [s.replace("_", ":") for s in pair]
+                for i, pair in enumerate(knockout["semi_finals"])
+            },
+        })
+        finals = knockout.get("final") or [["SF1", "SF2"]]
+        stages.append({
+            "name": "final",
+            "type": "knockout",
+            "matches": {
+                ("F" if i == 0 else f"F{i + 1}"): [f"W:{s}" for s in pair]
+                for i, pair in enumerate(finals)
+            },
+        })
+    return stages
+
+
+def compile_format(config: dict) -> TournamentPlan:
+    """Turn a format config into a TournamentPlan (raises ValueError)."""
+    stages = config.get("stages") or legacy_stages(config)
+
+    teams: List[str] = []
+    team_index: Dict[str, int] = {}
+    seeds: List[Tuple[int, int]] = []  # (slot, team)
+    group_slots: Dict[str, np.ndarray] = {}
+    match_slots: Dict[str, Tuple[int, int]] = {}  # id -> (winner, loser)
+    slot_names: List[str] = []
+
+    def new_slots(names: List[str]) -> np.ndarray:
+        out = np.arange(len(slot_names), len(slot_names) + len(names))
+        slot_names.extend(names)
+        return out
+
+    def resolve(entry: str, where: str) -> int:
+        entry = str(entry).strip()
+        if ":" not in entry:
+            if entry not in team_index:
+                team_index[entry] = len(teams)
+                teams.append(entry)
+            slot = int(new_slots([f"seed:{len(seeds)}"])[0])
+            seeds.append((slot, team_index[entry]))
+            return slot
+
+        ref, arg = (s.strip() for s in entry.split(":", 1))
+        if ref in ("W", "L"):
+            if arg not in match_slots:
+                raise ValueError(f"{where}: unknown match {arg!r} in {entry!r}")
+            return match_slots[arg][0 if ref == "W" else 1]
+        if ref not in group_slots:
+            raise ValueError(f"{where}: unknown group {ref!r} in {entry!r}")
+        pos = int(arg) - 1
+        if not 0 <= pos < len(group_slots[ref]):
+            raise ValueError(f"{where}: group {ref} has no position {arg}")
+        return int(group_slots[ref][pos])
+
+    plan_steps: List[Step] = []
+    stage_names: List[str] = []
+    stage_slots: List[np.ndarray] = []
+    champion_slot = -1
+
+    for s_i, stage in enumerate(stages):
+        name = stage.get("name", f"stage{s_i + 1}")
+        kind = stage.get("type", "round_robin")
+        stage_names.append(name)
+        entering: List[int] = []
+
+        if kind == "round_robin":
+            rules = {k: stage[k] for k in RULE_KEYS if k in stage}
+            rules["tiebreakers"] = validate_tiebreakers(
+                rules.get("tiebreakers", DEFAULT_TIEBREAKERS))
+            legs = int(stage.get("legs", 1))
+            for g, members in stage["groups"].items():
+                if g in ("W", "L"):
+                    raise ValueError(
+                        f"{name}: group name {g!r} is reserved for "
+                        "winner/loser references (W:<match>, L:<match>)")
+                if g in group_slots:
+                    raise ValueError(f"{name}: duplicate group name {g!r}")
+                inputs = np.array(
+                    [resolve(m, f"{name}/{g}") for m in members])
+                pairs = list(combinations(range(len(inputs)), 2)) * legs
+                outputs = new_slots(
+                    [f"{g}:{k + 1}" for k in range(len(inputs))])
+                group_slots[g] = outputs
+                entering.extend(inputs)
+                plan_steps.append(
+                    RoundRobinStep(stage=s_i,
+                                   inputs=inputs,
+                                   outputs=outputs,
+                                   fixtures=np.array(pairs, dtype=np.int64)
+                                   .reshape(-1, 2),
+                                   rules=rules))
+                champion_slot = int(outputs[0])
+
+        elif kind in ("knockout", "eliminator"):
+            # Matches may feed each other (e.g. qualifier loser -> Q2), so
+            # emit them in waves whose inputs are all already resolved.
+            pending = dict(stage["matches"])
+            while pending:
+                wave = [
+                    m for m, sides in pending.items()
+                    if all(not str(x).startswith(("W:", "L:"))
+                           or str(x)[2:].strip() in match_slots
+                           for x in sides)
+                ]
+                if not wave:
+                    raise ValueError(
+                        f"{name}: unresolved match references in "
+                        f"{', '.join(pending)}")
+                inputs = np.array([[
+                    resolve(x, f"{name}/{m}") for x in pending[m]
+                ] for m in wave])
+                if inputs.shape[1] != 2:
+                    raise ValueError(f"{name}: every match needs two sides")
+                winners = new_slots([f"W:{m}" for m in wave])
+                losers = new_slots([f"L:{m}" for m in wave])
+                for k, m in enumerate(wave):
+                    if m in match_slots:
+                        raise ValueError(f"{name}: duplicate match id {m!r}")
+                    match_slots[m] = (int(winners[k]), int(losers[k]))
+                    del pending[m]
+                entering.extend(inputs.ravel())
+                plan_steps.append(
+                    KnockoutStep(stage=s_i,
+                                 inputs=inputs,
+                                 winners=winners,
+                                 losers=losers))
+                champion_slot = int(winners[-1])
+        else:
+            raise ValueError(f"{name}: unknown stage type {kind!r}")
+
+        stage_slots.append(np.array(entering, dtype=np.int64))
+
+    if config.get("champion"):
+        champion_slot = resolve(config["champion"], "champion")
+    if champion_slot < 0:
+        raise ValueError("format has no stages")
+
+    seed_slots = np.array([slot for slot, _ in seeds], dtype=np.int64)
+    seed_teams = np.array([team for _, team in seeds], dtype=np.int64)
+
+    return TournamentPlan(
+        name=config.get("tournament", "T20WC"),
+        as_of=str(config.get("as_of", DEFAULT_AS_OF)),
+        teams=teams,
+        stage_names=stage_names,
+        n_slots=len(slot_names),
+        seed_slots=seed_slots,
+        seed_teams=seed_teams,
+        steps=plan_steps,
+        stage_slots=stage_slots,
+        champion_slot=champion_slot,
+        slot_names=slot_names,
+        groups=group_slots,
+    )
@@ -0,0 +1,302 @@
+"""
+Per-simulation tournament traces.
+
+A trace records, for every simulated tournament, which team filled every
+slot of the compiled plan ("A:1", "W:SF1", "L:Q1", "seed:0", ...). It is
+stored column by column so questions that touch a few slots only read
+those slots:
+
+    <path>.npz               zip container, also readable with np.load
+      meta.json              teams, columns, stage/champion layout, chunks
+      <column>/<chunk>.npy   uint8 team indices, deflate-compressed
+
+Columns are written one simulation batch at a time, so neither writing nor
+querying ever holds more than one batch in memory.
+
+    python -m src.traces artifacts/traces/t20wc.npz \
+        --wins India --reaches Pakistan semi
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from src.tournament import KnockoutStep, TournamentPlan
+
+TRACE_DIR = "artifacts/traces"
+# Traces the API writes to TRACE_DIR; older ones are deleted past this.
+TRACE_KEEP = 20
+
+
+class TraceStats:
+    """
+    Streaming accumulators over slot tables:
+      - positions[group]: (n_teams, group size) finishing-position counts
+      - matchups[stage]:  (n_teams, n_teams) counts of knockout pairings
+                          in that stage, stored with the lower index first
+    """
+
+    def __init__(self, plan: TournamentPlan):
+        self.plan = plan
+        n_teams = len(plan.teams)
+        self.n_sims = 0
+        self.positions = {
+            g: np.zeros((n_teams, len(out)), dtype=np.int64)
+            for g, out in plan.groups.items()
+        }
+        self.matchups: Dict[str, np.ndarray] = {}
+        for step in plan.steps:
+            if isinstance(step, KnockoutStep):
+                name = plan.stage_names[step.stage]
+                self.matchups.setdefault(
+                    name, np.zeros((n_teams, n_teams), dtype=np.int64))
+
+    def update(self, slots: np.ndarray) -> None:
+        n_teams = len(self.plan.teams)
+        self.n_sims += len(slots)
+
+        for g, outputs in self.plan.groups.items():
+            for pos, slot in enumerate(outputs):
+                self.positions[g][:, pos] += np.bincount(slots[:, slot],
+                                                         minlength=n_teams)
+
+        for step in self.plan.steps:
+            if not isinstance(step, KnockoutStep):
+                continue
+            a = slots[:, step.inputs[:, 0]].ravel()
+            b = slots[:, step.inputs[:, 1]].ravel()
+            pair = np.minimum(a, b) * n_teams + np.maximum(a, b)
+            self.matchups[self.plan.stage_names[step.stage]] += np.bincount(
+                pair, minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+
+    def summary(self, top: int = 10) -> dict:
+        """Percentages: finishing positions per group, likeliest pairings."""
+        teams = self.plan.teams
+        n = max(self.n_sims, 1)
+
+        positions = {}
+        for g, counts in self.positions.items():
+            positions[g] = {
+                teams[t]: [float(c / n * 100) for c in counts[t]]
+                for t in np.flatnonzero(counts.sum(axis=1))
+            }
+
+        matchups = {}
+        for stage, counts in self.matchups.items():
+            flat = counts.ravel()
+            best = np.argsort(flat, kind="stable")[::-1][:top]
+            matchups[stage] = [{
+                "teams": [teams[k // len(teams)], teams[k % len(teams)]],
+                "pct": float(flat[k] / n * 100),
+            } for k in best if flat[k]]
+
+        return {"positions": positions, "matchups": matchups}
+
+
+class TraceWriter:
+    """
+    Streams slot tables from `simulate_tournament(..., trace=writer)` to a
+    trace file and keeps TraceStats over them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.plan: TournamentPlan | None = None
+        self.stats: TraceStats | None = None
+        self._zip: zipfile.ZipFile | None = None
+        self._chunks: List[int] = []
+        self._dtype = np.uint8
+        self.closed = False
+
+    def begin(self, plan: TournamentPlan) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.plan = plan
+        self.stats = TraceStats(plan)
+        self._dtype = np.uint8 if len(plan.teams) <= 256 else np.uint16
+        self._zip = zipfile.ZipFile(self.path, "w",
+                                    compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, slots: np.ndarray) -> None:
+        k = len(self._chunks)
+        for col, name in enumerate(self.plan.slot_names):
+            with self._zip.open(f"{name}/{k:05d}.npy", "w",
+                                force_zip64=True) as f:
+                np.lib.format.write_array(f, slots[:, col].astype(self._dtype))
+        self._chunks.append(len(slots))
+        self.stats.update(slots)
+
+    def close(self) -> dict:
+        plan = self.plan
+        meta = {
+            "tournament": plan.name,
+            "as_of": plan.as_of,
+            "teams": plan.teams,
+            "columns": plan.slot_names,
+            "stages": {
+                name: [plan.slot_names[s] for s in plan.stage_slots[i]]
+                for i, name in enumerate(plan.stage_names)
+            },
+            "champion": plan.slot_names[plan.champion_slot],
+            "chunks": self._chunks,
+            "n_sims": int(sum(self._chunks)),
+        }
+        self._zip.writestr("meta.json", json.dumps(meta, indent=2))
+        self._zip.close()
+        self.closed = True
+        return {"path": self.path, **self.stats.summary()}
+
+    def abort(self) -> None:
+        """Close and delete a trace whose simulation failed."""
+        if self._zip is not None:
+            self._zip.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.closed = True
+
+
+def prune_traces(directory: str = TRACE_DIR, keep: int = TRACE_KEEP,
+                 pattern: str = "simulate-*.npz") -> List[str]:
+    """Delete all but the `keep` newest traces matching `pattern`."""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)),
+                   key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        os.remove(path)
+    return paths[keep:]
+
+
+@dataclass(frozen=True)
+class Condition:
+    """A per-simulation predicate over a few trace columns."""
+    columns: Tuple[str, ...]
+    test: Callable[[Dict[str, np.ndarray]], np.ndarray]
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return Condition(self.columns + other.columns,
+                         lambda c: self.test(c) & other.test(c))
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return Condition(self.columns + other.columns,
+                         lambda c: self.test(c) | other.test(c))
+
+    def __invert__(self) -> "Condition":
+        return Condition(self.columns, lambda c: ~self.test(c))
+
+
+class TraceReader:
+    """
+    Joint-probability queries over a trace, one batch at a time:
+
+        tr = TraceReader(path)
+        tr.probability(tr.wins("India") & tr.reaches("Pakistan", "semi"))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with zipfile.ZipFile(path) as zf:
+            self.meta = json.loads(zf.read("meta.json"))
+        self.teams: List[str] = self.meta["teams"]
+        self.n_sims: int = self.meta["n_sims"]
+        self._index = {t: i for i, t in enumerate(self.teams)}
+
+    def team(self, name: str) -> int:
+        if name not in self._index:
+            raise ValueError(f"{name!r} is not in this tournament")
+        return self._index[name]
+
+    def chunks(self, columns: Sequence[str]) -> Iterator[Dict[str, np.ndarray]]:
+        columns = list(dict.fromkeys(columns))
+        unknown = [c for c in columns if c not in self.meta["columns"]]
+        if unknown:
+            raise ValueError(f"Unknown trace column(s): {', '.join(unknown)}")
+        with zipfile.ZipFile(self.path) as zf:
+            for k in range(len(self.meta["chunks"])):
+                batch = {}
+                for col in columns:
+                    with zf.open(f"{col}/{k:05d}.npy") as f:
+                        batch[col] = np.lib.format.read_array(f)
+                yield batch
+
+    # -- conditions --------------------------------------------------------
+
+    def slot_is(self, column: str, team: str) -> Condition:
+        t = self.team(team)
+        return Condition((column,), lambda c: c[column] == t)
+
+    def wins(self, team: str) -> Condition:
+        return self.slot_is(self.meta["champion"], team)
+
+    def finishes(self, team: str, group: str, position: int) -> Condition:
+        return self.slot_is(f"{group}:{position}", team)
+
+    def reaches(self, team: str, stage: str) -> Condition:
+        if stage not in self.meta["stages"]:
+            raise ValueError(f"Unknown stage {stage!r} (expected any of "
+                             f"{', '.join(self.meta['stages'])})")
+        t = self.team(team)
+        cols = tuple(self.meta["stages"][stage])
+        return Condition(cols,
+                         lambda c: np.any([c[x] == t for x in cols], axis=0))
+
+    # -- queries -----------------------------------------------------------
+
+    def count(self, cond: Condition) -> int:
+        return int(sum(np.count_nonzero(cond.test(batch))
+                       for batch in self.chunks(cond.columns)))
+
+    def probability(self, cond: Condition) -> float:
+        return self.count(cond) / self.n_sims
+
+    def conditional(self, cond: Condition, given: Condition) -> float:
+        """P(cond | given); nan if `given` never happened."""
+        n_given = self.count(given)
+        return self.count(cond & given) / n_given if n_given else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Joint probabilities from a simulation trace. "
+        "All conditions are combined with AND.")
+    parser.add_argument("path")
+    parser.add_argument("--wins", action="append", default=[], metavar="TEAM")
+    parser.add_argument("--reaches", action="append", default=[], nargs=2,
+                        metavar=("TEAM", "STAGE"))
+    parser.add_argument("--finishes", action="append", default=[], nargs=3,
+                        metavar=("TEAM", "GROUP", "POS"))
+    parser.add_argument("--given", action="append", default=[], nargs=2,
+                        metavar=("TEAM", "STAGE"),
+                        help="condition on TEAM reaching STAGE")
+    args = parser.parse_args()
+
+    tr = TraceReader(args.path)
+    conds = ([tr.wins(t) for t in args.wins] +
+             [tr.reaches(t, s) for t, s in args.reaches] +
+             [tr.finishes(t, g, int(p)) for t, g, p in args.finishes])
+    if not conds:
+        print(json.dumps({k: tr.meta[k]
+                          for k in ("tournament", "as_of", "n_sims", "stages")},
+                         indent=2))
+        return
+
+    cond = conds[0]
+    for c in conds[1:]:
+        cond = cond & c
+
+    if args.given:
+        given = tr.reaches(*args.given[0])
+        for t, s in args.given[1:]:
+            given = given & tr.reaches(t, s)
+        p = tr.conditional(cond, given)
+    else:
+        p = tr.probability(cond)
+    print(f"{p * 100:.2f}% of {tr.n_sims} simulations")
+
+
+if __name__ == "__main__":
+    main()